@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import mmap
+import os
+import pickle
+import signal
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from aggregates import install_cube
+from bitmaps import install_bitmap_index
+from column_store import restore_store
+from data_loader import DATASET_PATH, get_dataset, install_version, loaded_dataset
+from derived import DERIVED_COLUMNS, install_derived
+from questions import COMPUTE, compute_question, install_results, load_dashboard_data
+from snapshot import restore_snapshot
+
+# Where the aggregate server publishes: a directory private to the user (mode 0700), by default in
+# shared memory (tmpfs) where available, so the published pages live in RAM and are shared by every
+# process of the user that maps them. Attaching unpickles the publication, so directories and files
+# that another user owns or could write to are refused (see _private).
+_USER = os.getuid() if hasattr(os, 'getuid') else os.environ.get('USERNAME', 'user')
+SERVER_DIR = os.environ.get('STATICA_SERVER_DIR',
+                            os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                                         f'statica-{_USER}'))
+
+# How often the server looks for a new version of the dataset
+POLL_SECONDS = 2.0
+
+# Bump when the published layout changes; publications of another format are ignored
+SERVER_FORMAT = 5
+
+# File header: magic, then offset and length of the metadata pickle
+HEADER = struct.Struct('<8sQQ')
+MAGIC = b'STATICA1'
+
+# Buffers are aligned to cache lines
+ALIGNMENT = 64
+
+_attach_lock = threading.Lock()
+_attached = {}
+
+
+# Published file of a dataset path
+def publication_path(path=DATASET_PATH, directory=SERVER_DIR):
+    path = os.path.abspath(path)
+    digest = hashlib.blake2b(path.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(directory, f"{os.path.basename(path)}.{digest}.agg")
+
+
+# Whether a directory or file (given its stat result) is owned by this user and writable by no one
+# else, so its contents are as trusted as this process
+def _private(stat):
+    if not hasattr(os, 'getuid'):
+        return True
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# Publish the current version of a dataset for every dashboard process of the user on the host:
+# its rows, derived columns, aggregate cube, bitmap index and the results of every question on all
+# rows. They are pickled with out-of-band buffers, so every array lands in the file as raw bytes
+# that attached processes use in place (see attach_aggregates). The file is replaced atomically;
+# processes that mapped the previous one keep it until they attach the new one. Returns the file.
+def publish(path=DATASET_PATH, directory=SERVER_DIR):
+    entry = get_dataset(path)
+    data = load_dashboard_data(path, streaming=False)
+    for name in DERIVED_COLUMNS:
+        data.derived[name]
+    payload = {'df': data.df, 'derived': data.derived, 'cube': data.cube, 'index': data.index,
+               'results': {question: compute_question(question, data) for question in COMPUTE}}
+    buffers = []
+    main = pickle.dumps(payload, protocol=5, buffer_callback=buffers.append)
+
+    layout = []
+    offset = HEADER.size + len(main)
+    for buffer in buffers:
+        offset = _aligned(offset)
+        layout.append((offset, buffer.raw().nbytes))
+        offset += layout[-1][1]
+    meta = pickle.dumps({'format': SERVER_FORMAT, 'pandas': pd.__version__, 'path': entry.path,
+                         'fingerprint': entry.fingerprint, 'offset': entry.mark.offset, 'stat': entry.stat,
+                         'probe': entry.mark.probe,
+                         'main': (HEADER.size, len(main)), 'buffers': layout})
+
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not _private(os.stat(directory)):
+        raise RuntimeError(f"Refusing to publish to {directory}: it must be owned by this user and not writable by "
+                           f"others")
+    target = publication_path(path, directory)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+        f.write(HEADER.pack(MAGIC, offset, len(meta)))
+        f.write(main)
+        for buffer, (start, _) in zip(buffers, layout):
+            f.seek(start)
+            f.write(buffer.raw())
+        f.seek(offset)
+        f.write(meta)
+    os.replace(tmp_path, target)
+    return target
+
+
+# Metadata and mapped contents of a published file, or None when it is not a usable publication
+# (including files that are not private to this user, or symbolic links)
+def _read_publication(target):
+    try:
+        if not _private(os.stat(os.path.dirname(target))):
+            return None
+        fd = os.open(target, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+        with open(fd, 'rb') as f:
+            if not _private(os.fstat(f.fileno())):
+                return None
+            view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        magic, offset, length = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            return None
+        meta = pickle.loads(view[offset:offset + length])
+    except (OSError, ValueError, struct.error, pickle.UnpicklingError, EOFError):
+        return None
+    if meta.get('format') != SERVER_FORMAT or meta.get('pandas') != pd.__version__:
+        return None
+    return meta, view
+
+
+# Attach this process to the server's publication of a dataset, when there is one newer than the
+# version already loaded: the rows, derived columns, cube, bitmap index and question results
+# are installed in the process caches as read-only views of the mapped file, so nothing is parsed
+# or computed and the memory is shared with every other attached process. Unless the file is
+# unchanged since publication it is hashed up to the published offset (see install_version). Cheap when nothing changed (one stat), so it
+# can run on every rerun to follow new versions. Returns whether a publication was attached.
+def attach_aggregates(path=DATASET_PATH, directory=SERVER_DIR):
+    target = publication_path(path, directory)
+    try:
+        stat = os.stat(target)
+    except OSError:
+        return False
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _attach_lock:
+        if _attached.get(target) == key:
+            return False
+        _attached[target] = key
+        publication = _read_publication(target)
+        if publication is None:
+            return False
+        meta, view = publication
+        current = loaded_dataset(path)
+        if current is not None and (current.fingerprint == meta['fingerprint']
+                                    or current.mark.offset > meta['offset']):
+            return False
+
+        start, length = meta['main']
+        payload = pickle.loads(view[start:start + length],
+                               buffers=[view[offset:offset + size] for offset, size in meta['buffers']])
+        entry = install_version(path, meta['offset'], meta['fingerprint'], payload['df'],
+                                replace=current is not None, stat=meta['stat'], probe=meta['probe'])
+        if entry is None:
+            return False
+        install_derived(entry, payload['derived'])
+        install_cube(entry, payload['cube'])
+        install_bitmap_index(entry, payload['index'])
+        install_results(entry.fingerprint, payload['results'])
+        return True
+
+
+# Publish the dataset, then again whenever a new version appears, until interrupted; the
+# publication is removed on exit so new processes stop attaching to it
+def serve(path=DATASET_PATH, directory=SERVER_DIR, poll=POLL_SECONDS):
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    restore_snapshot(path) or restore_store(path)
+    published = None
+    try:
+        while True:
+            entry = get_dataset(path)
+            if entry.fingerprint != published:
+                start = time.perf_counter()
+                target = publish(path, directory)
+                published = entry.fingerprint
+                print(f"Published {len(entry.df):,} rows of version {published[:12]} to {target} "
+                      f"({os.path.getsize(target) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f} s", flush=True)
+            time.sleep(poll)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if published is not None:
+            try:
+                os.remove(publication_path(path, directory))
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute the aggregates of a dataset once for the host and publish '
+                                                 'them to the dashboard processes through shared memory.')
+    parser.add_argument('--dataset', default=DATASET_PATH, help='CSV file to serve')
+    parser.add_argument('--output', default=SERVER_DIR, help='publication directory (default: %(default)s)')
+    parser.add_argument('--poll', type=float, default=POLL_SECONDS, help='seconds between checks for a new version')
+    args = parser.parse_args()
+    serve(args.dataset, args.output, args.poll)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+import copy
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from correlations import CorrelationStats, group_correlations
+from data_loader import DATASET_PATH, get_dataset
+from derived import DERIVED_COLUMNS, compute_column, load_derived
+from sketches import QuantileSketch, group_sketches
+
+DIMENSIONS = ['Gender', 'Location', 'Product Category', 'Device Type', 'Payment Method', 'Subscription Status',
+              'Customer Satisfaction', 'Discount Availed', 'Return Customer', 'Age', 'Review Score (1-5)',
+              'Number of Items Purchased', 'Delivery Time (days)', 'Age Range', 'Age Group', 'Time Bins',
+              'Purchase Bins']
+
+MEASURES = ['Age', 'Purchase Amount ($)', 'Time Spent on Website (min)', 'Number of Items Purchased',
+            'Return Customer', 'Review Score (1-5)', 'Delivery Time (days)']
+
+PAIRS = [('Location', 'Payment Method'),
+         ('Location', 'Product Category'),
+         ('Age Range', 'Gender'),
+         ('Age Group', 'Payment Method'),
+         ('Product Category', 'Payment Method')]
+
+# Engine the cubes are built with (STATICA_ENGINE): 'pandas' counts with numpy on one thread;
+# 'duckdb' runs the group-bys in process on every core (needs the duckdb package, see engines.py)
+ENGINES = ['pandas', 'duckdb']
+ENGINE = os.environ.get('STATICA_ENGINE', 'pandas')
+
+# Measures whose percentiles are answered from quantile sketches, overall and per dimension
+QUANTILE_MEASURES = ['Purchase Amount ($)', 'Delivery Time (days)']
+QUANTILE_DIMENSIONS = ['Location', 'Product Category']
+
+# Dimensions with a correlation matrix of the measures per label
+CORRELATION_DIMENSIONS = ['Location', 'Product Category']
+
+
+# Values of a dimension column, taking binned dimensions from the derived columns when given
+def dimension_values(df, dim, derived=None):
+    if dim in DERIVED_COLUMNS:
+        return derived[dim] if derived is not None else compute_column(df, dim)
+    return df[dim]
+
+
+# Integer codes (-1 for missing) and sorted labels of a dimension
+def encode_dimension(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return np.asarray(values.cat.codes, dtype=np.int64), pd.Index(values.cat.categories)
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), pd.Index(uniques)
+
+
+# Count, non-null count, sum and sum of squares of every measure for one group key
+class GroupStats:
+    def __init__(self, dims, labels, count, n, sums, sumsqs):
+        self.dims = dims
+        self.labels = labels
+        self.count = count
+        self.n = n
+        self.sums = sums
+        self.sumsqs = sumsqs
+
+
+# The query interface the dashboard questions are written against, with the statistics every
+# aggregate store derives the same way from its count/mean/var lookups. Subclasses implement
+# count(*dims), sum(measure, *dims), mean(measure, *dims) and var(measure, *dims), and keep the
+# quantile sketches from build_sketches() and correlation statistics from build_correlations().
+class Aggregates:
+    def std(self, measure, *dims):
+        return np.sqrt(self.var(measure, *dims))
+
+    # Equivalent of Series.value_counts() for a dimension
+    def value_counts(self, dim, normalize=False):
+        counts = self.count(dim)
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+        if normalize:
+            return (counts / counts.sum()).rename('proportion')
+        return counts
+
+    # Most frequent value (smallest label on ties, like Series.mode()[0])
+    def mode(self, dim):
+        counts = self.count(dim)
+        return counts.index[int(np.argmax(counts.to_numpy()))]
+
+    # Exact median of a numeric dimension from its value histogram
+    def median(self, dim):
+        counts = self.count(dim)
+        counts = counts[counts > 0]
+        total = int(counts.sum())
+        if total == 0:
+            return np.nan
+        cumulative = np.cumsum(counts.to_numpy())
+        values = counts.index.to_numpy(dtype=np.float64)
+        lower = values[np.searchsorted(cumulative, (total - 1) // 2, side='right')]
+        upper = values[np.searchsorted(cumulative, total // 2, side='right')]
+        return (lower + upper) / 2
+
+    # Quantile(s) q of a measure from its sketches: a number overall, a Series per group for one
+    # dimension, or a DataFrame with one column per q when q is a list
+    def quantile(self, measure, q, *dims):
+        if not dims:
+            return self.sketches[(measure,)].quantile(q)
+        sketches = self.sketches[(measure, dims[0])]
+        labels = sorted(sketches)
+        index = pd.Index(labels, name=dims[0])
+        if np.ndim(q) == 0:
+            return pd.Series([sketches[label].quantile(q) for label in labels], index=index, name=measure)
+        return pd.DataFrame([sketches[label].quantile(q) for label in labels], index=index, columns=list(q))
+
+    # Normalized rank error bound of quantile() for the same arguments (0 when the answer is exact)
+    def quantile_error(self, measure, *dims):
+        if not dims:
+            return self.sketches[(measure,)].rank_error
+        return max((sketch.rank_error for sketch in self.sketches[(measure, dims[0])].values()), default=0.0)
+
+    # Pearson correlation of two measures over pairwise-complete rows
+    def corr(self, x, y):
+        stats = self.correlations[()]
+        return stats.matrix()[stats.columns.index(x), stats.columns.index(y)]
+
+    # Pearson correlation matrix of the measures over pairwise-complete rows: a table overall, or the
+    # tables of every label of a dimension stacked with a (label, measure) index, like
+    # DataFrame.groupby(dim).corr()
+    def corr_matrix(self, *dims):
+        if not dims:
+            stats = self.correlations[()]
+            return pd.DataFrame(stats.matrix(), index=stats.columns, columns=stats.columns)
+        groups = self.correlations[(dims[0],)]
+        return pd.concat({label: pd.DataFrame(groups[label].matrix(), index=groups[label].columns,
+                                              columns=groups[label].columns) for label in sorted(groups)},
+                         names=[dims[0], None])
+
+
+# Quantile sketches of the QUANTILE_MEASURES overall, keyed (measure,), and per label of the
+# QUANTILE_DIMENSIONS, keyed (measure, dimension)
+def build_sketches(values, codes, labels, measures=QUANTILE_MEASURES, dimensions=QUANTILE_DIMENSIONS):
+    sketches = {}
+    for measure in measures:
+        sketches[(measure,)] = QuantileSketch().update(values[measure])
+        for dim in dimensions:
+            sketches[(measure, dim)] = group_sketches(values[measure], codes[dim], labels[dim])
+    return sketches
+
+
+# Correlation statistics of the measures (the columns of `values`) over all rows, keyed (), and
+# per label of the CORRELATION_DIMENSIONS, keyed (dimension,)
+def build_correlations(values, codes, labels, measures, dimensions=CORRELATION_DIMENSIONS):
+    correlations = {(): CorrelationStats(measures).update(values)}
+    for dim in dimensions:
+        correlations[(dim,)] = group_correlations(values, codes[dim], labels[dim], measures)
+    return correlations
+
+
+# Union of two sketch collections built by build_sketches(), leaving both inputs untouched
+def merge_sketches(mine, theirs):
+    result = {}
+    for key, sketch in mine.items():
+        if len(key) == 1:
+            result[key] = sketch.merged(theirs[key])
+        else:
+            result[key] = {label: group.copy() for label, group in sketch.items()}
+            for label, group in theirs[key].items():
+                current = result[key].get(label)
+                result[key][label] = group.copy() if current is None else current.merge(group)
+    return result
+
+
+# Union of two correlation collections built by build_correlations(), leaving both inputs untouched
+def merge_correlations(mine, theirs):
+    result = {(): mine[()].merged(theirs[()])}
+    for key, groups in mine.items():
+        if key:
+            result[key] = {label: stats.copy() for label, stats in groups.items()}
+            for label, stats in theirs[key].items():
+                current = result[key].get(label)
+                result[key][label] = stats.copy() if current is None else current.merge(stats)
+    return result
+
+
+# Aggregates for every dimension and the common dimension pairs, built once from the codes so that
+# each dashboard question is answered by slicing small per-group arrays instead of scanning rows.
+class AggregateCube(Aggregates):
+    def __init__(self, df, dimensions=DIMENSIONS, measures=MEASURES, pairs=PAIRS, derived=None):
+        self.rows = len(df)
+        self.measures = list(measures)
+        self._measure_index = {m: i for i, m in enumerate(self.measures)}
+
+        values = np.column_stack([df[m].to_numpy(dtype=np.float64) for m in self.measures])
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        # Column-major, so each weight column handed to np.bincount is one contiguous array
+        weights = np.asfortranarray(np.column_stack([valid, filled, filled * filled]), dtype=np.float64)
+
+        self._moments(valid, filled)
+
+        codes = {}
+        self.labels = {}
+        for dim in dimensions:
+            codes[dim], self.labels[dim] = encode_dimension(dimension_values(df, dim, derived))
+
+        self._groups = {}
+        for key in [(dim,) for dim in dimensions] + [tuple(pair) for pair in pairs]:
+            self._groups[key] = self._aggregate(key, codes, weights)
+
+        self.sketches = build_sketches({m: values[:, self._measure_index[m]] for m in QUANTILE_MEASURES},
+                                       codes, self.labels)
+        self.correlations = build_correlations(values, codes, self.labels, self.measures)
+
+    # Totals of every measure
+    def _moments(self, valid, filled):
+        self.total_n = valid.sum(axis=0).astype(np.float64)
+        self.total_sum = filled.sum(axis=0)
+        self.total_sumsq = (filled * filled).sum(axis=0)
+
+    # New cube covering the rows of both cubes. Every stored statistic is a sum, so the arrays are
+    # realigned on the union of labels and added; cost depends on the number of groups only.
+    def merged(self, other):
+        result = copy.copy(self)
+        result.rows = self.rows + other.rows
+        for name in ['total_n', 'total_sum', 'total_sumsq']:
+            setattr(result, name, getattr(self, name) + getattr(other, name))
+        result.sketches = merge_sketches(self.sketches, other.sketches)
+        result.correlations = merge_correlations(self.correlations, other.correlations)
+
+        result.labels = {}
+        for dim, labels in self.labels.items():
+            new = other.labels[dim].difference(labels, sort=False)
+            combined = labels.append(new)
+            if dim not in DERIVED_COLUMNS:
+                combined = combined.sort_values()
+            result.labels[dim] = combined
+
+        result._groups = {}
+        for key, group in self._groups.items():
+            theirs = other._groups[key]
+            labels = [result.labels[dim] for dim in key]
+            shape = tuple(len(index) for index in labels)
+            arrays = {}
+            for name in ['count', 'n', 'sums', 'sumsqs']:
+                mine, their_array = getattr(group, name), getattr(theirs, name)
+                array = np.zeros(shape + mine.shape[len(key):], dtype=mine.dtype)
+                for source, source_group in [(mine, group), (their_array, theirs)]:
+                    positions = np.ix_(*[index.get_indexer(source_labels)
+                                         for index, source_labels in zip(labels, source_group.labels)])
+                    array[positions] += source
+                arrays[name] = array
+            result._groups[key] = GroupStats(key, labels, arrays['count'], arrays['n'], arrays['sums'],
+                                             arrays['sumsqs'])
+        return result
+
+    def _aggregate(self, key, codes, weights):
+        shape = tuple(len(self.labels[dim]) for dim in key)
+        combined = np.zeros(self.rows, dtype=np.int64)
+        present = np.ones(self.rows, dtype=bool)
+        for dim, size in zip(key, shape):
+            combined = combined * size + codes[dim]
+            present &= codes[dim] >= 0
+        if not present.all():
+            combined = combined[present]
+            weights = np.asfortranarray(weights[present])
+        size = int(np.prod(shape))
+        m = len(self.measures)
+
+        count = np.bincount(combined, minlength=size).reshape(shape)
+        stacked = np.column_stack([np.bincount(combined, weights=weights[:, j], minlength=size)
+                                   for j in range(weights.shape[1])])
+        stacked = stacked.reshape(shape + (weights.shape[1],))
+        return GroupStats(key, [self.labels[dim] for dim in key], count,
+                          stacked[..., :m], stacked[..., m:2 * m], stacked[..., 2 * m:])
+
+    def _group(self, dims):
+        dims = tuple(dims)
+        if dims in self._groups:
+            return self._groups[dims], False
+        if dims[::-1] in self._groups:
+            return self._groups[dims[::-1]], True
+        raise KeyError(f"No aggregates for {dims}")
+
+    def _frame(self, dims, array, name=None, dropna=True):
+        group, transposed = self._group(dims)
+        if transposed:
+            array = array.T
+        labels = group.labels[::-1] if transposed else group.labels
+        if len(dims) == 1:
+            result = pd.Series(array, index=labels[0].rename(dims[0]), name=name)
+            if dropna:
+                result = result[group.count > 0]
+            return result
+        return pd.DataFrame(array, index=labels[0].rename(dims[0]), columns=labels[1].rename(dims[1]))
+
+    def _measure(self, group, stat, measure):
+        return getattr(group, stat)[..., self._measure_index[measure]]
+
+    # Number of rows per group (Series for one dimension, table for a pair)
+    def count(self, *dims):
+        if not dims:
+            return self.rows
+        group, _ = self._group(dims)
+        return self._frame(dims, group.count, name='count')
+
+    # Sum of a measure, overall or per group
+    def sum(self, measure, *dims):
+        if not dims:
+            return self.total_sum[self._measure_index[measure]]
+        group, _ = self._group(dims)
+        return self._frame(dims, self._measure(group, 'sums', measure), name=measure)
+
+    # Mean of a measure, overall or per group
+    def mean(self, measure, *dims):
+        if not dims:
+            i = self._measure_index[measure]
+            return self.total_sum[i] / self.total_n[i] if self.total_n[i] else np.nan
+        group, _ = self._group(dims)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            array = self._measure(group, 'sums', measure) / self._measure(group, 'n', measure)
+        return self._frame(dims, array, name=measure)
+
+    # Sample variance (ddof=1) of a measure, overall or per group
+    def var(self, measure, *dims):
+        if not dims:
+            i = self._measure_index[measure]
+            n, s, ss = self.total_n[i], self.total_sum[i], self.total_sumsq[i]
+            return (ss - s * s / n) / (n - 1) if n > 1 else np.nan
+        group, _ = self._group(dims)
+        n = self._measure(group, 'n', measure)
+        s = self._measure(group, 'sums', measure)
+        ss = self._measure(group, 'sumsqs', measure)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            array = np.where(n > 1, (ss - s * s / n) / (n - 1), np.nan)
+        return self._frame(dims, array, name=measure)
+
+
+# Cube of a frame built by the given engine (see ENGINES)
+def build_cube(df, derived=None, engine=ENGINE):
+    if engine == 'pandas':
+        return AggregateCube(df, derived=derived)
+    if engine == 'duckdb':
+        from engines import DuckDBCube
+        return DuckDBCube(df, derived=derived)
+    raise ValueError(f"Unknown query engine {engine!r} (expected one of {', '.join(ENGINES)})")
+
+
+_cubes = {}
+_cubes_lock = threading.Lock()
+
+
+# Cube for the current version of a dataset file, built once and shared by every session. When the
+# version only appended rows to the previous one, the previous cube is merged with a cube of the
+# appended rows instead of being rebuilt from all rows.
+def load_cube(path=DATASET_PATH):
+    entry = get_dataset(path)
+    key = (entry.path, entry.fingerprint)
+    with _cubes_lock:
+        cube = _cubes.get(key)
+        if cube is None:
+            previous = _cubes.get((entry.path, entry.parent))
+            if previous is not None and entry.appended is not None:
+                cube = previous.merged(build_cube(entry.appended))
+            else:
+                cube = build_cube(entry.df, derived=load_derived(path))
+            for stale in [k for k in _cubes if k[0] == entry.path]:
+                del _cubes[stale]
+            _cubes[key] = cube
+        return cube
+
+
+# Seed the cache with the cube of a dataset entry (e.g. from a startup snapshot)
+def install_cube(entry, cube):
+    with _cubes_lock:
+        return _cubes.setdefault((entry.path, entry.fingerprint), cube)
+
+
+# Drop cached cubes (all of them, or only those of the given path)
+def clear_cube_cache(path=None):
+    with _cubes_lock:
+        for key in [k for k in _cubes if path is None or k[0] == os.path.abspath(path)]:
+            del _cubes[key]
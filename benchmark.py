@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+
+import matplotlib
+
+# Figures are rendered off-screen
+matplotlib.use('Agg')
+
+import numpy as np
+import pandas as pd
+
+from aggregates import clear_cube_cache
+from bitmaps import clear_bitmap_cache
+from data_loader import clear_dataset_cache, get_dataset
+from derived import clear_derived_cache
+from figure_cache import render_figure
+from questions import QUESTIONS, clear_results_cache, compute_question, load_dashboard_data
+from streaming import clear_streaming_cache, load_streaming_aggregates
+from synthetic_data import synthetic_dataset
+
+# Dataset sizes benchmarked by default
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+# Synthetic datasets are kept here between runs
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".benchmark")
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def _clear_caches(path):
+    clear_dataset_cache(path)
+    clear_derived_cache(path)
+    clear_cube_cache(path)
+    clear_bitmap_cache(path)
+    clear_streaming_cache(path)
+    clear_results_cache()
+
+
+# Time one cold pass over a dataset: 'load' (parse the CSV, or the chunked scan when streaming),
+# 'prepare' (build the aggregates, derived columns and bitmap index), then 'compute' and 'render'
+# for every question. Returns one record per measurement.
+def benchmark_pass(path, streaming=False):
+    _clear_caches(path)
+    records = []
+    if streaming:
+        seconds, _ = _timed(load_streaming_aggregates, path)
+        records.append({'phase': 'load', 'question': None, 'seconds': seconds})
+    else:
+        seconds, _ = _timed(get_dataset, path)
+        records.append({'phase': 'load', 'question': None, 'seconds': seconds})
+    seconds, data = _timed(load_dashboard_data, path, streaming)
+    records.append({'phase': 'prepare', 'question': None, 'seconds': seconds})
+
+    for question, _, _ in QUESTIONS:
+        seconds, result = _timed(compute_question, question, data)
+        records.append({'phase': 'compute', 'question': question, 'seconds': seconds})
+        render_seconds = 0.0
+        for draw, *args in result.figures.values():
+            seconds, _ = _timed(lambda: render_figure(draw(*args)))
+            render_seconds += seconds
+        records.append({'phase': 'render', 'question': question, 'seconds': render_seconds,
+                        'figures': len(result.figures)})
+    _clear_caches(path)
+    return records
+
+
+def environment():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'matplotlib': matplotlib.__version__}
+
+
+# Run the benchmark for every size (and repeat), returning the machine-readable results
+def run_benchmark(sizes=SIZES, repeat=1, streaming=False, directory=BENCHMARK_DIR, seed=0):
+    results = []
+    for rows in sizes:
+        path = synthetic_dataset(rows, directory, seed)
+        for run in range(repeat):
+            for record in benchmark_pass(path, streaming):
+                results.append({'rows': rows, 'mode': 'streaming' if streaming else 'in-memory', 'run': run,
+                                **record})
+    return {'environment': environment(), 'results': results}
+
+
+# Median seconds per size, phase and question, as a table for the console
+def summarize(results):
+    frame = pd.DataFrame(results['results'])
+    frame['question'] = frame['question'].fillna('-')
+    summary = frame.groupby(['rows', 'phase', 'question'], sort=False)['seconds'].agg(statistics.median)
+    return summary.unstack('rows')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time load, compute and render of every dashboard question on '
+                                                 'synthetic datasets.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='row counts (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=1, help='cold passes per size')
+    parser.add_argument('--streaming', action='store_true', help='benchmark the streaming mode')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic data')
+    parser.add_argument('--data-dir', default=BENCHMARK_DIR, help='where synthetic datasets are kept')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file for the results')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.repeat, args.streaming, args.data_dir, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(summarize(results).round(4))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATASET_PATH, get_dataset
+
+# Columns of the sidebar filter bar: categorical columns filtered by value, numeric ones by range
+FILTER_COLUMNS = ['Location', 'Gender', 'Device Type', 'Payment Method', 'Subscription Status']
+RANGE_FILTER_COLUMNS = ['Age', 'Purchase Amount ($)']
+
+# Columns with one bitmap per value: the sidebar filters plus the flags and scores that
+# conjunctive counts combine
+VALUE_COLUMNS = ['Location', 'Gender', 'Device Type', 'Payment Method', 'Subscription Status',
+                 'Customer Satisfaction', 'Discount Availed', 'Return Customer', 'Review Score (1-5)', 'Age']
+
+# Continuous columns get one bitmap per bin of this width; ranges resolve whole bins from the
+# bitmaps and check the values of the rows in the two edge bins only
+BINNED_COLUMNS = {'Purchase Amount ($)': 25.0}
+
+
+# Number of set bits (selected rows) of a bitmap
+def popcount(bitmap):
+    return int(np.bitwise_count(bitmap).sum())
+
+
+# Bitmap (little-endian bits in uint64 words) of a boolean row mask
+def pack(mask):
+    words = (len(mask) + 63) // 64
+    packed = np.zeros(words * 8, dtype=np.uint8)
+    packed[:(len(mask) + 7) // 8] = np.packbits(mask, bitorder='little')
+    return packed.view(np.uint64)
+
+
+# Uncompressed row bitmaps of one dataset version: for every value of the VALUE_COLUMNS and every
+# bin of the BINNED_COLUMNS, the set of rows holding it, packed 64 rows per word. A combination of
+# filters resolves with bitwise OR (values of one column) and AND (across columns), and counts
+# with popcount, instead of scanning the columns.
+class BitmapIndex:
+    def __init__(self, df, value_columns=VALUE_COLUMNS, binned_columns=BINNED_COLUMNS):
+        self.rows = len(df)
+        self.words = (self.rows + 63) // 64
+        self.bitmaps = {}
+        self.labels = {}
+        for column in value_columns:
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                codes, labels = np.asarray(values.cat.codes), values.cat.categories
+            else:
+                codes, labels = pd.factorize(values, sort=True)
+            self.labels[column] = list(labels)
+            self.bitmaps[column] = {label: pack(codes == i) for i, label in enumerate(labels)}
+
+        self._binned = {}
+        for column, width in binned_columns.items():
+            values = df[column].to_numpy(dtype=np.float64)
+            bins = np.floor(values / width)
+            present = np.unique(bins[~np.isnan(bins)]).astype(np.int64)
+            self._binned[column] = (width, values)
+            self.bitmaps[column] = {int(b): pack(bins == b) for b in present}
+            self.labels[column] = [float(np.nanmin(values)), float(np.nanmax(values))] if len(present) else []
+
+        self.all = pack(np.ones(self.rows, dtype=bool))
+
+    # Rows holding any of the values of a column
+    def rows_with(self, column, values):
+        bitmaps = self.bitmaps[column]
+        result = np.zeros(self.words, dtype=np.uint64)
+        for value in values:
+            bitmap = bitmaps.get(value)
+            if bitmap is not None:
+                result |= bitmap
+        return result
+
+    # Rows whose value of a column lies in [low, high]
+    def rows_between(self, column, low, high):
+        if column not in self._binned:
+            return self.rows_with(column, [value for value in self.labels[column] if low <= value <= high])
+        width, values = self._binned[column]
+        first, last = int(np.floor(low / width)), int(np.floor(high / width))
+        result = np.zeros(self.words, dtype=np.uint64)
+        for b, bitmap in self.bitmaps[column].items():
+            if first < b < last:
+                result |= bitmap
+        for b in {first, last}:
+            bitmap = self.bitmaps[column].get(b)
+            if bitmap is not None:
+                rows = np.flatnonzero(self.mask(bitmap))
+                inside = rows[(values[rows] >= low) & (values[rows] <= high)]
+                edge = np.zeros(self.rows, dtype=bool)
+                edge[inside] = True
+                result |= pack(edge)
+        return result
+
+    # Rows matching every filter (see Filters)
+    def select(self, filters):
+        result = self.all.copy()
+        for column, values in filters.values.items():
+            result &= self.rows_with(column, values)
+        for column, (low, high) in filters.ranges.items():
+            result &= self.rows_between(column, low, high)
+        return result
+
+    # Number of rows in the intersection of the given bitmaps
+    def count(self, *bitmaps):
+        result = self.all.copy()
+        for bitmap in bitmaps:
+            result &= bitmap
+        return popcount(result)
+
+    # Boolean row mask of a bitmap, for selecting the rows of the indexed frame
+    def mask(self, bitmap):
+        return np.unpackbits(bitmap.view(np.uint8), count=self.rows, bitorder='little').view(bool)
+
+
+# Filter state of the sidebar: accepted values per categorical column and inclusive (low, high)
+# ranges per numeric column. Columns without a constraint are left out, so an empty Filters
+# selects every row. key is hashable and JSON-friendly, for cache keys.
+class Filters:
+    def __init__(self, values=None, ranges=None):
+        self.values = {column: tuple(v) for column, v in (values or {}).items()}
+        self.ranges = {column: (float(low), float(high)) for column, (low, high) in (ranges or {}).items()}
+
+    def __bool__(self):
+        return bool(self.values or self.ranges)
+
+    @property
+    def key(self):
+        return (tuple(sorted((column, tuple(sorted(map(str, v)))) for column, v in self.values.items())),
+                tuple(sorted(self.ranges.items())))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+# Bitmap index of the current version of a dataset file, built on first use and shared by every
+# session
+def load_bitmap_index(path=DATASET_PATH):
+    entry = get_dataset(path)
+    key = (entry.path, entry.fingerprint)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            for stale in [k for k in _indexes if k[0] == entry.path]:
+                del _indexes[stale]
+            index = BitmapIndex(entry.df)
+            _indexes[key] = index
+        return index
+
+
+# Seed the cache with the index of a dataset entry (e.g. from a startup snapshot)
+def install_bitmap_index(entry, index):
+    with _indexes_lock:
+        return _indexes.setdefault((entry.path, entry.fingerprint), index)
+
+
+# Drop cached indexes (all of them, or only those of the given path)
+def clear_bitmap_cache(path=None):
+    with _indexes_lock:
+        for key in [k for k in _indexes if path is None or k[0] == os.path.abspath(path)]:
+            del _indexes[key]
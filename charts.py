@@ -0,0 +1,589 @@
+import matplotlib
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+import seaborn as sns
+import numpy as np
+
+# Figure builders for the dashboard questions. Each takes the already computed numbers and
+# returns the drawn figure, so the caller decides whether to render, cache or skip it.
+# Figures are created with matplotlib's object-oriented API and never registered with pyplot, so
+# there is no shared "current figure" state and several figures can be drawn in parallel threads.
+
+
+# Seaborn's "whitegrid" look applied to one axes. sns.axes_style() would change the process-wide
+# rcParams, which other threads may be reading while they draw.
+def _whitegrid(ax):
+    ax.set_facecolor('white')
+    ax.set_axisbelow(True)
+    ax.grid(True, color='.8')
+    for spine in ax.spines.values():
+        spine.set_edgecolor('.8')
+    ax.tick_params(colors='.15', bottom=False, left=False)
+    for label in [ax.xaxis.label, ax.yaxis.label, ax.title]:
+        label.set_color('.15')
+
+
+# Placeholder for a chart whose data the filters left empty
+def _no_customers(ax):
+    ax.text(0.5, 0.5, 'No customers', ha='center', va='center', transform=ax.transAxes)
+
+
+# Level 1 Q1: mean, median and mode of Age
+def plot_age_statistics(statistics, values):
+    # Create a smaller bar chart
+    fig = Figure(figsize=(5, 3))  # Further reduced size
+    ax = fig.subplots()
+    ax.bar(statistics, values, color=['#1f77b4', '#ff7f0e', '#2ca02c'])
+
+    # Add title and labels
+    ax.set_title('Mean, Median, and Mode of Age', fontsize=12)  # Smaller font size
+    ax.set_ylabel('Age', fontsize=9)  # Smaller font size
+
+    # Add values on top of each bar
+    for i, v in enumerate(values):
+        ax.text(i, v + 0.2, f'{v:.2f}', ha='center', fontsize=9)  # Smaller font size for values
+    return fig
+
+
+# Resolution (index bins, z-score bins) of the Z-score density image
+Z_SCORE_DENSITY_BINS = (500, 200)
+
+# Most outlier markers drawn on top of the density image; more are thinned evenly
+MAX_OUTLIER_MARKERS = 5000
+
+
+# Level 1 Q2: Z-score of every purchase amount
+def plot_purchase_z_scores(z_scores, density_threshold):
+    if len(z_scores) >= density_threshold:
+        return plot_purchase_z_score_density(z_scores)
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    sns.scatterplot(x=z_scores.index, y=z_scores, hue=z_scores, palette='coolwarm', edgecolor='w', s=100, ax=ax)
+    ax.axhline(0, color='black', linewidth=1, linestyle='--')
+    ax.axhline(3, color='red', linestyle='--', label='Z = 3')
+    ax.axhline(-3, color='red', linestyle='--', label='Z = -3')
+    ax.set_title('Z-scores of Purchase Amounts')
+    ax.set_xlabel('Index')
+    ax.set_ylabel('Z-score')
+    ax.legend()
+    return fig
+
+
+# Level 1 Q2 for large datasets: the index/z-score plane binned into a fixed-size density image,
+# with explicit markers only for |z| > 3, so drawing cost depends on the image size and not on
+# the number of rows
+def plot_purchase_z_score_density(z_scores, bins=Z_SCORE_DENSITY_BINS, max_outliers=MAX_OUTLIER_MARKERS):
+    x = np.asarray(z_scores.index, dtype=np.float64)
+    y = z_scores.to_numpy(dtype=np.float64)
+    finite = np.isfinite(y)
+    x, y = x[finite], y[finite]
+
+    y_limit = max(3.5, float(np.abs(y).max()) if len(y) else 3.5)
+    x_range = (float(x.min()), float(x.max()) + 1) if len(x) else (0.0, 1.0)
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins, range=[x_range, [-y_limit, y_limit]])
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    image = ax.imshow(np.ma.masked_equal(counts.T, 0), origin='lower', aspect='auto', cmap='viridis',
+                      extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]), interpolation='nearest',
+                      norm=LogNorm(vmin=1))
+    fig.colorbar(image, ax=ax, label='Rows per bin')
+
+    outliers = np.flatnonzero(np.abs(y) > 3)
+    if len(outliers) > max_outliers:
+        outliers = outliers[np.linspace(0, len(outliers) - 1, max_outliers).astype(np.int64)]
+    ax.scatter(x[outliers], y[outliers], c=y[outliers], cmap='coolwarm', vmin=-y_limit, vmax=y_limit, s=12,
+               edgecolors='none', label='|Z| > 3')
+
+    ax.axhline(0, color='black', linewidth=1, linestyle='--')
+    ax.axhline(3, color='red', linestyle='--', label='Z = 3')
+    ax.axhline(-3, color='red', linestyle='--', label='Z = -3')
+    ax.set_title(f'Z-scores of Purchase Amounts ({len(y):,} rows, density)')
+    ax.set_xlabel('Index')
+    ax.set_ylabel('Z-score')
+    ax.legend()
+    return fig
+
+
+# Level 1 Q2 from streamed aggregates: distribution of the purchase amount z-scores
+def plot_purchase_z_score_histogram(z_centers, counts):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    width = float(np.min(np.diff(z_centers))) if len(z_centers) > 1 else 0.1
+    outlier = np.abs(z_centers) > 3
+    ax.bar(z_centers[~outlier], counts[~outlier], width=width, color='#4c72b0', label='Rows')
+    ax.bar(z_centers[outlier], counts[outlier], width=width, color='red', label='|Z| > 3')
+    ax.axvline(0, color='black', linewidth=1, linestyle='--')
+    ax.axvline(3, color='red', linestyle='--', label='Z = 3')
+    ax.axvline(-3, color='red', linestyle='--', label='Z = -3')
+    ax.set_title('Distribution of Z-scores of Purchase Amounts')
+    ax.set_xlabel('Z-score')
+    ax.set_ylabel('Number of Purchases')
+    ax.legend()
+    return fig
+
+
+# Level 1 Q3: top product categories by number of purchases
+def plot_top_categories(top_categories):
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    top_categories.plot(kind='bar', color=['skyblue', 'lightgreen', 'salmon'], ax=ax)
+
+    # Adding titles and labels
+    ax.set_title('Top 3 Product Categories by Number of Purchases', fontsize=14)
+    ax.set_xlabel('Product Categories', fontsize=12)
+    ax.set_ylabel('Number of Purchases', fontsize=12)
+
+    # Adding the count values on top of each bar
+    for index, value in enumerate(top_categories):
+        ax.text(index, value, str(value), ha='center', va='bottom', fontsize=10)
+    return fig
+
+
+# Level 1 Q4: return rate per product category
+def plot_return_rate_by_category(comparison_summary):
+    categories = comparison_summary['Product Category']
+    return_rates = comparison_summary['Return Rate (%)']
+
+    # Create a horizontal bar chart
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.barh(categories, return_rates, color='#4c72b0')
+
+    # Add title and labels
+    ax.set_title('Return Rate by Product Category', fontsize=16)
+    ax.set_xlabel('Return Rate (%)', fontsize=12)
+    ax.set_ylabel('Product Category', fontsize=12)
+
+    # Add value labels to each bar
+    for index, value in enumerate(return_rates):
+        ax.text(value + 0.5, index, f'{value:.2f}%', va='center', fontsize=10)
+
+    fig.tight_layout()
+    return fig
+
+
+# Level 1 Q4: return customers per age range and gender
+def plot_return_customers_by_age_gender(age_gender_return_summary):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    _whitegrid(ax)
+    sns.barplot(x='Age Range', y='Count', hue='Gender', data=age_gender_return_summary, palette='Set2',
+                edgecolor='w', ax=ax)
+    legend = ax.get_legend()
+    for text in [legend.get_title(), *legend.get_texts()]:
+        text.set_color('.15')
+
+    # Add title and labels
+    ax.set_title('Return Customers by Age Range and Gender', fontsize=16)
+    ax.set_xlabel('Age Range', fontsize=12)
+    ax.set_ylabel('Count of Return Customers', fontsize=12)
+
+    fig.tight_layout()
+    return fig
+
+
+# Level 1 Q5: share of reviews per product category
+def plot_review_distribution(comparison_summary):
+    fig = Figure(figsize=(10, 8))
+    ax = fig.subplots()
+    ax.pie(comparison_summary['Total Reviews'],
+           labels=comparison_summary['Product Category'],
+           autopct='%1.1f%%',
+           startangle=140,
+           colors=matplotlib.colormaps['tab20'].colors)
+    ax.set_title('Distribution of Total Reviews by Product Category', fontsize=16)
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    return fig
+
+
+# Level 1 Q5: total reviews next to the average review score per product category
+def plot_reviews_and_scores_by_category(comparison_summary):
+    fig = Figure(figsize=(12, 8))
+    ax = fig.subplots()
+
+    bar_width = 0.35
+    index = np.arange(len(comparison_summary['Product Category']))
+
+    colors_total_reviews = matplotlib.colormaps['Blues'](np.linspace(0.3, 1, len(comparison_summary)))
+    colors_avg_review_score = matplotlib.colormaps['Greens'](np.linspace(0.3, 1, len(comparison_summary)))
+
+    bars1 = ax.barh(index, comparison_summary['Total Reviews'], bar_width, label='Total Reviews',
+                    color=colors_total_reviews)
+    bars2 = ax.barh(index + bar_width, comparison_summary['Average Review Score'], bar_width,
+                    label='Average Review Score', color=colors_avg_review_score)
+
+    ax.set_ylabel('Product Categories', fontsize=12)
+    ax.set_xlabel('Count / Score', fontsize=12)
+    ax.set_title('Total Reviews and Average Review Scores by Product Category', fontsize=16)
+
+    ax.set_yticks(index + bar_width / 2)
+    ax.set_yticklabels(comparison_summary['Product Category'])
+
+    ax.legend()
+
+    for bar in bars1:
+        xval = bar.get_width()
+        ax.text(xval, bar.get_y() + bar.get_height() / 2, int(xval), va='center', ha='left', color='black')
+
+    for bar in bars2:
+        xval = bar.get_width()
+        ax.text(xval, bar.get_y() + bar.get_height() / 2, f'{xval:.1f}', va='center', ha='left', color='black')
+
+    fig.tight_layout()
+    return fig
+
+
+# Level 1 Q6: average delivery time per subscription status
+def plot_delivery_time_by_subscription(avg_delivery_time_df):
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    _whitegrid(ax)
+    sns.barplot(x='Subscription Status', y='Delivery Time (days)', data=avg_delivery_time_df,
+                palette='muted', edgecolor='w', ax=ax)
+
+    # Add title and labels
+    ax.set_title('Average Delivery Time by Subscription Status', fontsize=16)
+    ax.set_xlabel('Subscription Status', fontsize=12)
+    ax.set_ylabel('Average Delivery Time (days)', fontsize=12)
+
+    fig.tight_layout()
+    return fig
+
+
+# Level 1 Q7: subscribed vs unsubscribed customers
+def plot_subscription_distribution(subscribed_customers, unsubscribed_customers):
+    labels = ['Subscribed Customers', 'Unsubscribed Customers']
+    sizes = [subscribed_customers, unsubscribed_customers]
+    colors = ['lightcoral', 'lightgreen']
+    explode = (0.1, 0)  # explode the first slice
+
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    ax.pie(sizes, explode=explode, labels=labels, colors=colors,
+           autopct='%1.1f%%', shadow=True, startangle=140)
+    ax.set_title('Subscription Status Distribution')
+    ax.axis('equal')  # Equal aspect ratio ensures that pie chart is circular.
+    return fig
+
+
+# Level 1 Q8: share of customers per device type
+def plot_device_usage(device_usage_percentage):
+    fig = Figure(figsize=(7, 7))
+    ax = fig.subplots()
+    ax.pie(device_usage_percentage, labels=device_usage_percentage.index,
+           autopct='%1.1f%%', startangle=140, colors=sns.color_palette('Set2'))
+    ax.set_title('Device Usage Percentage')
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    return fig
+
+
+# Level 1 Q9: average purchase amount with and without discount
+def plot_purchase_by_discount(avg_purchase_discount):
+    fig = Figure(figsize=(7, 5))
+    ax = fig.subplots()
+    sns.barplot(x=avg_purchase_discount.index, y=avg_purchase_discount.values, palette='Set2', ax=ax)
+    ax.set_title('Average Purchase Amount by Discount Status')
+    ax.set_ylabel('Average Purchase Amount ($)')
+    ax.set_xlabel('Discount Availed (0 = No, 1 = Yes)')
+    return fig
+
+
+# Level 1 Q10: number of users per payment method
+def plot_payment_method_distribution(payment_method_counts):
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    sns.barplot(x=payment_method_counts.index, y=payment_method_counts.values, palette='Set3', ax=ax)
+    ax.set_title('Payment Method Distribution')
+    ax.set_ylabel('Number of Users')
+    ax.set_xlabel('Payment Method')
+    return fig
+
+
+# Average review scores and count of reviews by payment method
+def plot_reviews_by_payment_method(avg_reviews_by_payment, count_reviews_by_payment):
+    fig = Figure(figsize=(10, 6))
+    ax1 = fig.subplots()
+
+    color = 'tab:blue'
+    ax1.set_xlabel('Payment Method')
+    ax1.set_ylabel('Average Review Score (1-5)', color=color)
+    avg_reviews_by_payment.plot(kind='bar', color=color, ax=ax1, position=1, width=0.4)
+    ax1.tick_params(axis='y', labelcolor=color)
+    ax1.set_ylim(0, 5)
+
+    ax2 = ax1.twinx()
+    color = 'tab:orange'
+    ax2.set_ylabel('Count of Reviews', color=color)
+    count_reviews_by_payment.plot(kind='bar', color=color, ax=ax2, position=0, width=0.4)
+    ax2.tick_params(axis='y', labelcolor=color)
+
+    ax2.set_title('Average Review Scores and Count of Reviews by Payment Method')
+    ax2.tick_params(axis='x', labelrotation=45)
+    return fig
+
+
+# Level 2 Q1: average review score of the most common payment method
+def plot_most_common_payment_review(most_common_payment_method, average_review_score):
+    fig = Figure(figsize=(6, 4))
+    ax = fig.subplots()
+    sns.barplot(x=[most_common_payment_method], y=[average_review_score], palette='Blues_d', ax=ax)
+    ax.set_title(f'Average Review Score for {most_common_payment_method}', fontsize=14)
+    ax.set_xlabel('Payment Method', fontsize=12)
+    ax.set_ylabel('Average Review Score', fontsize=12)
+    ax.text(0, average_review_score, f'{average_review_score:.2f}', ha='center', va='bottom', fontsize=12)
+    fig.tight_layout()
+    return fig
+
+
+# Level 2 Q1: Bank Transfer users per age group
+def plot_bank_transfer_age_groups(age_group_counts):
+    fig = Figure(figsize=(6, 4))
+    ax = fig.subplots()
+    age_group_counts.plot(kind='bar', color='skyblue', ax=ax)
+    ax.set_title('Number of Bank Transfer Users by Age Group')
+    ax.set_xlabel('Age Group')
+    ax.set_ylabel('Number of Users')
+    ax.tick_params(axis='x', labelrotation=45)
+    return fig
+
+
+# Level 2 Q1: payment methods used by customers aged 10-19
+def plot_teen_payment_methods(payment_method_counts):
+    fig = Figure(figsize=(6, 4))
+    ax = fig.subplots()
+    if payment_method_counts.empty:
+        _no_customers(ax)
+    else:
+        payment_method_counts.plot(kind='bar', color='lightblue', ax=ax)
+    ax.set_title('Payment Methods Used by Customers Aged 10-19')
+    ax.set_xlabel('Payment Method')
+    ax.set_ylabel('Number of Users')
+    ax.tick_params(axis='x', labelrotation=45)
+    return fig
+
+
+# Level 2 Q1: number of users per location
+def plot_users_by_location(location_counts):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    location_counts.plot(kind='bar', color='lightcoral', ax=ax)
+    ax.set_title('Number of Users by Location')
+    ax.set_xlabel('Location')
+    ax.set_ylabel('Number of Users')
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    return fig
+
+
+# Number of Bank Transfer users per location, most first (streamlit.py)
+def plot_bank_transfer_users_by_location(location_counts):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    location_counts.plot(kind='bar', color='lightgreen', ax=ax)
+    ax.set_title('Number of Bank Transfer Users by Location')
+    ax.set_xlabel('Location')
+    ax.set_ylabel('Number of Users')
+    ax.tick_params(axis='x', labelrotation=45)
+    return fig
+
+
+# Level 2 Q1: one payment method pie per location of interest
+def plot_payment_methods_by_location(payment_methods_by_location, locations_of_interest):
+    fig = Figure(figsize=(18, 6))
+    axes = fig.subplots(1, len(locations_of_interest), squeeze=False)
+
+    for ax, location in zip(axes[0], locations_of_interest):
+        # Count payment methods for that location
+        payment_method_counts = payment_methods_by_location.loc[location]
+        payment_method_counts = payment_method_counts[payment_method_counts > 0].sort_values(ascending=False,
+                                                                                             kind='stable')
+
+        # Pie chart for each location (filters may leave a location without customers)
+        if payment_method_counts.empty:
+            _no_customers(ax)
+        else:
+            ax.pie(payment_method_counts, labels=payment_method_counts.index, autopct='%1.1f%%', startangle=90,
+                   colors=['#ff9999', '#66b3ff', '#99ff99', '#ffcc99'])
+        ax.set_title(f'Payment Methods Used in {location}')
+        ax.axis('equal')  # Equal aspect ratio ensures the pie is drawn as a circle
+
+    fig.tight_layout()
+    return fig
+
+
+# Level 2 Q2: purchase behaviour per bin of time spent on the website
+def plot_time_on_site(df_grouped):
+    fig = Figure(figsize=(16, 10))
+    ax1, ax2 = fig.subplots(2, 1)
+
+    # Subplot 1: Average Purchase Amount by Time Spent on Website
+    sns.lineplot(data=df_grouped, x='Time Bins', y='Purchase Amount ($)', marker='o', color='blue', ax=ax1)
+    ax1.set_title('Average Purchase Amount by Time Spent on Website')
+    ax1.set_xlabel('Time Spent on Website (min)')
+    ax1.set_ylabel('Average Purchase Amount ($)')
+    ax1.tick_params(axis='x', labelrotation=45)
+    ax1.set_ylim(450, 600)
+
+    # Subplot 2: Average Number of Items Purchased by Time Spent on Website
+    sns.lineplot(data=df_grouped, x='Time Bins', y='Number of Items Purchased', marker='o', color='green', ax=ax2)
+    ax2.set_title('Average Number of Items Purchased by Time Spent on Website')
+    ax2.set_xlabel('Time Spent on Website (min)')
+    ax2.set_ylabel('Average Number of Items Purchased')
+    ax2.tick_params(axis='x', labelrotation=45)
+    ax2.set_ylim(4, df_grouped['Number of Items Purchased'].max() * 1.1)
+
+    fig.tight_layout()
+    return fig
+
+
+# Level 2 Q4: average items purchased per satisfaction level
+def plot_items_by_satisfaction(average_items_per_satisfaction):
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    sns.barplot(x=average_items_per_satisfaction.index, y=average_items_per_satisfaction.values, ax=ax)
+    ax.set_title('Relationship between Customer Satisfaction and Number of Items Purchased')
+    ax.set_xlabel('Customer Satisfaction')
+    ax.set_ylabel('Average Number of Items Purchased')
+    return fig
+
+
+# Level 2 Q5: average purchase amount per location, marking the 2nd highest
+def plot_purchase_by_location(sorted_average_purchase, second_highest_avg_purchase):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    sns.barplot(x=sorted_average_purchase.index, y=sorted_average_purchase.values, palette='viridis', ax=ax)
+    if not np.isnan(second_highest_avg_purchase):
+        ax.axhline(y=second_highest_avg_purchase, color='r', linestyle='--', label='2nd Highest Average Purchase')
+        ax.legend()
+    ax.set_title('Average Purchase Amount by Location')
+    ax.set_xlabel('Location')
+    ax.set_ylabel('Average Purchase Amount ($)')
+    ax.tick_params(axis='x', labelrotation=45)
+    return fig
+
+
+# Level 2 Q6: correlation matrix of the numeric columns
+def plot_correlation_matrix(correlations, title):
+    fig = Figure(figsize=(9, 7))
+    ax = fig.subplots()
+    sns.heatmap(correlations, vmin=-1, vmax=1, center=0, cmap='coolwarm', annot=True, fmt='.2f', square=True,
+                cbar_kws={'label': 'Pearson r'}, ax=ax)
+    ax.set_title(f'Correlations Between Numeric Columns: {title}', fontsize=14)
+    fig.tight_layout()
+    return fig
+
+
+# Level 2 Q6: one correlation matrix per label of a dimension, sharing one color scale
+def plot_correlation_matrices(correlations, dim):
+    labels = correlations.index.get_level_values(0).unique()
+    if len(labels) == 0:
+        fig = Figure(figsize=(6, 4))
+        _no_customers(fig.subplots())
+        return fig
+    columns = min(4, len(labels))
+    rows = -(-len(labels) // columns)
+    fig = Figure(figsize=(4.5 * columns, 4.5 * rows))
+    axes = fig.subplots(rows, columns, squeeze=False)
+    names = correlations.columns
+    for k, (ax, label) in enumerate(zip(axes.flat, labels)):
+        image = ax.imshow(correlations.loc[label].to_numpy(dtype=np.float64), vmin=-1, vmax=1, cmap='coolwarm')
+        ax.set_title(str(label))
+        # Column names only along the bottom and left edges of the grid
+        ax.set_xticks(range(len(names)), names if k + columns >= len(labels) else [], rotation=90)
+        ax.set_yticks(range(len(names)), names if k % columns == 0 else [])
+    for ax in axes.flat[len(labels):]:
+        ax.set_visible(False)
+    fig.colorbar(image, ax=axes, shrink=0.6, label='Pearson r')
+    fig.suptitle(f'Correlations Between Numeric Columns by {dim}', fontsize=16)
+    return fig
+
+
+# Level 3 Q2: satisfaction and return rate per payment method
+def plot_satisfaction_and_return_rate(combined_data):
+    fig = Figure(figsize=(10, 6))  # Adjust the size as needed
+    ax1 = fig.subplots()
+
+    # Bar plot for average review score
+    sns.barplot(x='Payment Method', y='Review Score (1-5)', data=combined_data, ax=ax1, palette='viridis')
+    ax1.set_ylabel('Average Review Score (1-5)', fontsize=12)
+    ax1.set_title('Customer Satisfaction and Return Rate by Payment Method', fontsize=16)
+
+    # Line plot for return rate
+    ax2 = ax1.twinx()
+    sns.lineplot(x='Payment Method', y='Return Rate (%)', data=combined_data, ax=ax2, color='red', marker='o',
+                 label='Return Rate (%)')
+    ax2.set_ylabel('Return Rate (%)', fontsize=12)
+    ax2.legend(loc='upper right')
+
+    ax2.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    return fig
+
+
+# Level 3 Q3: average purchase amount and delivery time per location
+def plot_location_purchase_and_delivery(location_data):
+    fig = Figure(figsize=(14, 6))
+    axs = fig.subplots(1, 2)
+
+    # Plot Average Purchase Amount by Location
+    sns.barplot(x='Location', y='Purchase Amount ($)', data=location_data, palette='Blues_d', ax=axs[0])
+    axs[0].set_title('Average Purchase Amount by Location')
+    axs[0].set_xticklabels(axs[0].get_xticks(), rotation=45)
+    axs[0].set_ylabel('Average Purchase Amount ($)')
+
+    # Plot Average Delivery Time by Location
+    sns.barplot(x='Location', y='Delivery Time (days)', data=location_data, palette='Greens_d', ax=axs[1])
+    axs[1].set_title('Average Delivery Time by Location')
+    axs[1].set_xticklabels(axs[1].get_xticks(), rotation=45)
+    axs[1].set_ylabel('Average Delivery Time (days)')
+
+    # Adjust layout
+    fig.tight_layout()
+    return fig
+
+
+# Level 3 Q4: gender distribution of customers
+def plot_gender_distribution(labels, sizes):
+    colors = ['#ff9999', '#66b3ff', '#99ff99']  # Define colors for each section
+
+    # Create the pie chart with a smaller figure size
+    fig = Figure(figsize=(3, 3))  # Further reduced figure size
+    ax = fig.subplots()
+    ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors,
+           explode=(0.05, 0.05, 0.05), shadow=True)
+
+    ax.axis('equal')  # Equal aspect ratio ensures that pie chart is circular.
+    ax.set_title('Gender Distribution of Customers', fontsize=10)  # Smaller title font size
+    return fig
+
+
+# Level 3 Q1: association of every feature with being a return customer, strongest first
+def plot_return_factors(factors, significance):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    _whitegrid(ax)
+    factors = factors.iloc[::-1]
+    colors = ['#d62728' if p < significance else '#7f7f7f' for p in factors['p-value']]
+    ax.barh(factors['Feature'], factors["Cramér's V"], color=colors)
+    ax.set_xlabel("Cramér's V")
+    ax.set_title(f'Association with Being a Return Customer (red: p < {significance:g})', fontsize=14)
+    fig.tight_layout()
+    return fig
+
+
+# Level 3 Q1: standardized difference of each numeric feature between return and other customers
+def plot_numeric_effects(effects, confidence):
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
+    _whitegrid(ax)
+    effects = effects.iloc[::-1]
+    d = effects["Cohen's d"]
+    errors = [d - effects['d CI low'], effects['d CI high'] - d]
+    ax.errorbar(d, effects['Feature'], xerr=errors, fmt='o', color='#1f77b4', capsize=4)
+    ax.axvline(0, color='.5', linestyle='--')
+    ax.set_xlabel(f"Cohen's d (return minus other customers, {confidence:.0%} CI)")
+    ax.set_title('Numeric Features of Return Customers', fontsize=14)
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,148 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATASET_PATH, dataset_loaded, get_dataset, install_version
+
+# Column stores are kept here; convert a dataset ahead of time (e.g. whenever the export is
+# refreshed) with `python column_store.py`
+STORE_DIR = os.environ.get('STATICA_STORE_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), ".store"))
+
+# Bump when the file layout changes; stores of another format are ignored
+STORE_FORMAT = 3
+
+MANIFEST = 'manifest.json'
+
+
+# Store directory of a dataset path. Each version of the dataset is a subdirectory named after its
+# fingerprint; the manifest names the current one.
+def store_path(path=DATASET_PATH, directory=STORE_DIR):
+    path = os.path.abspath(path)
+    digest = hashlib.blake2b(path.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(directory, f"{os.path.basename(path)}.{digest}")
+
+
+def _column_files(df, target):
+    columns = []
+    for i, (name, values) in enumerate(df.items()):
+        column = {'name': name, 'file': f'{i}.npy'}
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            array = np.asarray(values.cat.codes)
+            column['categories'] = values.cat.categories.tolist()
+        elif isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biuf':
+            array = values.to_numpy()
+        else:
+            # Other columns are dictionary encoded and decoded to their type on load (a copy)
+            array, uniques = pd.factorize(values)
+            column['values'] = uniques.tolist()
+            column['dtype'] = str(values.dtype)
+        np.save(os.path.join(target, column['file']), array)
+        columns.append(column)
+    return columns
+
+
+# Write the current version of a dataset, parsed from its CSV, as one .npy file per column:
+# numbers and flags as they are, categoricals as their codes with the categories in the
+# manifest. Versions other than the new one are removed; processes that mapped them keep reading
+# them until they reload. Returns the store directory.
+def write_store(path=DATASET_PATH, directory=STORE_DIR):
+    entry = get_dataset(path)
+    root = store_path(path, directory)
+    version = os.path.join(root, entry.fingerprint)
+    os.makedirs(root, exist_ok=True)
+
+    tmp_path = f"{version}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    columns = _column_files(entry.df, tmp_path)
+    if os.path.isdir(version):
+        shutil.rmtree(tmp_path)
+    else:
+        os.replace(tmp_path, version)
+
+    manifest = {'format': STORE_FORMAT, 'path': entry.path, 'fingerprint': entry.fingerprint,
+                'offset': entry.mark.offset, 'stat': entry.stat, 'probe': entry.mark.probe.hex(),
+                'rows': len(entry.df), 'columns': columns}
+    tmp_manifest = os.path.join(root, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp_manifest, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, os.path.join(root, MANIFEST))
+
+    for name in os.listdir(root):
+        stale = os.path.join(root, name)
+        if name != entry.fingerprint and os.path.isdir(stale) and not name.endswith('.tmp'):
+            shutil.rmtree(stale, ignore_errors=True)
+    return root
+
+
+# Manifest and rows of the stored version of a dataset (of the given fingerprint, when one is
+# given), or None when there is no such store. Numbers, flags and category codes are memory-mapped
+# read-only, so opening is cheap, pages are read only when a column is used and every process
+# mapping the store shares them through the page cache.
+def read_store(path=DATASET_PATH, directory=STORE_DIR, fingerprint=None):
+    root = store_path(path, directory)
+    try:
+        with open(os.path.join(root, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != STORE_FORMAT or fingerprint not in (None, manifest['fingerprint']):
+        return None
+
+    version = os.path.join(root, manifest['fingerprint'])
+    columns = {}
+    try:
+        for column in manifest['columns']:
+            array = np.asarray(np.load(os.path.join(version, column['file']), mmap_mode='r'))
+            if 'categories' in column:
+                dtype = pd.CategoricalDtype(column['categories'])
+                columns[column['name']] = pd.Categorical.from_codes(array, dtype=dtype, validate=False)
+            elif 'values' in column:
+                values = pd.Categorical.from_codes(array, categories=column['values'], validate=False)
+                columns[column['name']] = pd.Series(values).astype(column['dtype'])
+            else:
+                columns[column['name']] = array
+    except (OSError, ValueError):
+        return None
+    return manifest, pd.DataFrame(columns, copy=False)
+
+
+# Seed the dataset cache with the rows of the column store, unless the dataset is already loaded
+# or the store holds other content. Derived columns, aggregates and indexes are then built from
+# the mapped rows as usual. Returns whether the store was used.
+def restore_store(path=DATASET_PATH, directory=STORE_DIR):
+    if dataset_loaded(path):
+        return False
+    stored = read_store(path, directory)
+    if stored is None:
+        return False
+    manifest, df = stored
+    return install_version(path, manifest['offset'], manifest['fingerprint'], df, stat=manifest['stat'],
+                           probe=bytes.fromhex(manifest['probe'])) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a dataset CSV into the memory-mapped column store.')
+    parser.add_argument('--dataset', default=DATASET_PATH, help='CSV file to convert')
+    parser.add_argument('--output', default=STORE_DIR, help='store directory (default: %(default)s)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    root = write_store(args.dataset, args.output)
+    with open(os.path.join(root, MANIFEST)) as f:
+        manifest = json.load(f)
+    version = os.path.join(root, manifest['fingerprint'])
+    size = sum(os.path.getsize(os.path.join(version, name)) for name in os.listdir(version))
+    print(f"Wrote {manifest['rows']:,} rows to {version} ({size / 1e6:.1f} MB) in "
+          f"{time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
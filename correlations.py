@@ -0,0 +1,89 @@
+import numpy as np
+
+# Variances below this fraction of the sum of squares are rounding noise of a constant column
+VARIANCE_TOLERANCE = 1e-12
+
+
+# Sufficient statistics of the Pearson correlations between columns over pairwise-complete rows
+# (each pair of columns uses the rows where both are present, like DataFrame.corr()): for every
+# pair (i, j) the number of such rows, the sum and sum of squares of column i over them, and the sum
+# of the products. All of them are sums, so statistics of separate chunks or of appended rows add
+# up, and the correlation matrix takes O(columns²) however many rows were folded in.
+class CorrelationStats:
+    def __init__(self, columns):
+        self.columns = list(columns)
+        width = len(self.columns)
+        self.n = np.zeros((width, width))
+        self.sums = np.zeros((width, width))
+        self.sumsqs = np.zeros((width, width))
+        self.cross = np.zeros((width, width))
+
+    # Fold rows (one column per statistics column, NaN where missing) into the statistics
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return self
+        valid = ~np.isnan(values)
+        if valid.all():
+            # Nothing missing: every pair covers every row, so only the products need a matrix product
+            self.n += len(values)
+            self.sums += values.sum(axis=0)[:, None]
+            self.sumsqs += np.einsum('ij,ij->j', values, values)[:, None]
+            self.cross += values.T @ values
+            return self
+        filled = np.where(valid, values, 0.0)
+        valid = valid.astype(np.float64)
+        self.n += valid.T @ valid
+        self.sums += filled.T @ valid
+        self.sumsqs += (filled * filled).T @ valid
+        self.cross += filled.T @ filled
+        return self
+
+    # Fold another set of statistics of the same columns into this one
+    def merge(self, other):
+        self.n = self.n + other.n
+        self.sums = self.sums + other.sums
+        self.sumsqs = self.sumsqs + other.sumsqs
+        self.cross = self.cross + other.cross
+        return self
+
+    # New statistics of both inputs, leaving this one untouched
+    def merged(self, other):
+        return self.copy().merge(other)
+
+    def copy(self):
+        result = CorrelationStats(self.columns)
+        result.n = self.n.copy()
+        result.sums = self.sums.copy()
+        result.sumsqs = self.sumsqs.copy()
+        result.cross = self.cross.copy()
+        return result
+
+    # Pearson correlation matrix; NaN for pairs with fewer than two rows or a constant column
+    def matrix(self):
+        n = self.n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = self.cross - self.sums * self.sums.T / n
+            var = self.sumsqs - self.sums * self.sums / n
+            var = np.where(var > VARIANCE_TOLERANCE * self.sumsqs, var, np.nan)
+            corr = np.clip(cov / np.sqrt(var * var.T), -1.0, 1.0)
+        diagonal = np.diagonal(corr)
+        np.fill_diagonal(corr, np.where(np.isnan(diagonal), np.nan, 1.0))
+        return corr
+
+
+# Statistics per label of a coded dimension, built in a single sort over the codes
+def group_correlations(values, codes, labels, columns):
+    # Codes of a dimension with few labels sort as int16, which numpy radix-sorts
+    if len(labels) < np.iinfo(np.int16).max:
+        codes = codes.astype(np.int16)
+    order = np.argsort(codes, kind='stable')
+    boundaries = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+    # One gather of the rows in label order, so each label's rows are a contiguous slice
+    ordered = np.take(np.asarray(values, dtype=np.float64), order, axis=0)
+    stats = {}
+    for i, label in enumerate(labels):
+        start, end = boundaries[i], boundaries[i + 1]
+        if end > start:
+            stats[label] = CorrelationStats(columns).update(ordered[start:end])
+    return stats
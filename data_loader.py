@@ -0,0 +1,369 @@
+import argparse
+import hashlib
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Dataset bundled next to the dashboards
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ecommerce_customer_behavior_dataset.csv")
+
+# Column types of the customer dataset. Text columns are categoricals with fixed, sorted category
+# sets, so codes order like the labels and mean the same in every version and appended chunk; a
+# value outside a set is added to it, never dropped.
+CATEGORY_COLUMNS = {
+    'Gender': ['Female', 'Male', 'Other'],
+    'Location': ['Barisal', 'Chittagong', 'Dhaka', 'Khulna', 'Mymensingh', 'Rajshahi', 'Rangpur', 'Sylhet'],
+    'Product Category': ['Beauty', 'Books', 'Clothing', 'Electronics', 'Groceries', 'Home', 'Sports', 'Toys'],
+    'Device Type': ['Desktop', 'Mobile', 'Tablet'],
+    'Payment Method': ['Bank Transfer', 'Cash on Delivery', 'Credit Card', 'Debit Card', 'PayPal'],
+    'Subscription Status': ['Free', 'Premium', 'Trial'],
+    'Customer Satisfaction': ['High', 'Low', 'Medium'],
+}
+
+# Small integer columns are narrowed to these types when every value fits (read_csv itself would
+# wrap values that overflow)
+SMALL_INTEGER_COLUMNS = {
+    'Age': 'int8',
+    'Review Score (1-5)': 'int8',
+    'Delivery Time (days)': 'int8',
+    'Number of Items Purchased': 'int8',
+}
+
+# Flags stored as one-byte booleans, or as nullable booleans when values are missing
+BOOLEAN_COLUMNS = ['Discount Availed', 'Return Customer']
+
+# Bytes kept from just before the ingested offset to tell an append from a rewrite
+PROBE_BYTES = 4096
+
+# Process-wide cache: one parsed frame per file path, shared by every session and rerun
+_datasets = {}
+_datasets_lock = threading.Lock()
+
+
+# One parsed version of a dataset file. When the version was produced by an append, `parent` is
+# the fingerprint of the previous version and `appended` holds only the newly parsed rows, so
+# aggregates of the previous version can be updated instead of rebuilt.
+class LoadedDataset:
+    def __init__(self, path, stat, mark, df, parent=None, appended=None):
+        self.path = path
+        self.stat = stat
+        self.mark = mark
+        self.fingerprint = mark.fingerprint
+        self.df = df
+        self.parent = parent
+        self.appended = appended
+
+
+# How much of a file has been ingested: the byte offset (always at a line boundary), the content
+# hash state up to that offset, and the bytes just before it. A mark restored from recorded
+# metadata has no hash state yet, only the recorded fingerprint (see install_version).
+class IngestMark:
+    def __init__(self, offset, hasher, probe, fingerprint=None):
+        self.offset = offset
+        self.hasher = hasher
+        self.probe = probe
+        self._fingerprint = fingerprint
+
+    @property
+    def fingerprint(self):
+        return self._fingerprint if self.hasher is None else self.hasher.hexdigest()
+
+    # Whether the file up to the offset still has the mark's content. A mark without hash state
+    # hashes that part of the file now, once; other marks were hashed when they were made.
+    def verify(self, path):
+        if self.hasher is None:
+            hasher = ingest_mark(path, end=self.offset).hasher
+            if hasher.hexdigest() != self._fingerprint:
+                return False
+            self.hasher = hasher
+        return True
+
+    # Mark advanced over bytes [offset, end) of the file, hashing only the new bytes
+    def extend(self, path, end, block_size=1 << 20):
+        hasher = self.hasher.copy()
+        with open(path, 'rb') as f:
+            f.seek(self.offset)
+            remaining = end - self.offset
+            while remaining > 0:
+                block = f.read(min(block_size, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+        return IngestMark(end, hasher, _probe(path, end))
+
+
+def _probe(path, offset):
+    with open(path, 'rb') as f:
+        f.seek(max(0, offset - PROBE_BYTES))
+        return f.read(offset - max(0, offset - PROBE_BYTES))
+
+
+# Size and modification time of a file, cheap enough to check on every rerun
+def file_stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+# Mark covering the complete lines of a file (or its first `end` bytes), read in blocks so the file
+# is never held in memory
+def ingest_mark(path, block_size=1 << 20, end=None):
+    if end is None:
+        end = complete_lines_end(path)
+    return IngestMark(0, hashlib.blake2b(digest_size=16), b'').extend(path, end, block_size)
+
+
+# Content hash of the complete lines of a file
+def file_fingerprint(path, block_size=1 << 20):
+    return ingest_mark(path, block_size).fingerprint
+
+
+# Offset just after the last newline of a file (rows still being written are left for later)
+def complete_lines_end(path, start=0, block_size=1 << 16):
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        end = size
+        while end > start:
+            begin = max(start, end - block_size)
+            f.seek(begin)
+            block = f.read(end - begin)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                return begin + newline + 1
+            end = begin
+    return start
+
+
+# Byte range (start, end) of complete lines appended after the mark, or None when the file was
+# rewritten rather than appended to (it shrank, or the bytes before the mark changed)
+def appended_range(path, mark):
+    if (os.path.getsize(path) < mark.offset or _probe(path, mark.offset) != mark.probe
+            or not mark.verify(path)):
+        return None
+    return mark.offset, complete_lines_end(path, mark.offset)
+
+
+# Raw byte range of a file, readable as a stream so pandas can parse just that part
+class RangeReader(io.RawIOBase):
+    def __init__(self, f, end):
+        self._f = f
+        self._end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        remaining = self._end - self._f.tell()
+        if remaining <= 0:
+            return 0
+        return self._f.readinto(memoryview(buffer)[:remaining])
+
+
+# Frame with the dataset's column types (see CATEGORY_COLUMNS, SMALL_INTEGER_COLUMNS and
+# BOOLEAN_COLUMNS); columns the schema does not know, or values that do not fit it, keep the types
+# read_csv inferred
+def apply_schema(df):
+    columns = {}
+    for column, categories in CATEGORY_COLUMNS.items():
+        if column in df.columns:
+            values = df[column]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype('category')
+            extra = values.cat.categories.difference(categories)
+            if len(extra) or list(values.cat.categories) != categories:
+                values = values.cat.set_categories(sorted([*categories, *extra]))
+            columns[column] = values
+    for column, dtype in SMALL_INTEGER_COLUMNS.items():
+        if column in df.columns and pd.api.types.is_integer_dtype(df[column].dtype):
+            values = df[column]
+            limits = np.iinfo(dtype)
+            if values.empty or (values.min() >= limits.min and values.max() <= limits.max):
+                columns[column] = values.astype(dtype)
+    for column in BOOLEAN_COLUMNS:
+        # read_csv only infers bool when no flag is missing; otherwise it leaves objects
+        if column in df.columns and df[column].dtype != bool:
+            values = df[column]
+            if values.dropna().isin([True, False]).all():
+                values = values.astype('boolean')
+                columns[column] = values if values.hasnans else values.astype(bool)
+    return df.assign(**columns)
+
+
+# Rows of two frames of the dataset in one frame. Categoricals whose category sets differ (a value
+# new to one of them) are recoded to the union so they stay categorical.
+def concat_rows(df, tail):
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and column in tail.columns:
+            left, right = df[column].dtype, tail[column].dtype
+            if (isinstance(left, pd.CategoricalDtype) and isinstance(right, pd.CategoricalDtype)
+                    and not left.categories.equals(right.categories)):
+                categories = sorted(left.categories.union(right.categories))
+                df = df.assign(**{column: df[column].cat.set_categories(categories)})
+                tail = tail.assign(**{column: tail[column].cat.set_categories(categories)})
+    return pd.concat([df, tail], ignore_index=True)
+
+
+# Parse the CSV rows between two byte offsets into frames with the dataset's column types. Without
+# `names` the range must start with the header line; with `chunksize` an iterator of frames is
+# returned instead of one frame.
+def read_csv_range(path, start, end, names=None, chunksize=None):
+    f = open(path, 'rb')
+    f.seek(start)
+    stream = io.BufferedReader(RangeReader(f, end))
+    options = {'header': None, 'names': names} if names is not None else {}
+    options['dtype'] = {column: 'category' for column in CATEGORY_COLUMNS}
+    if chunksize is None:
+        with f:
+            return apply_schema(pd.read_csv(stream, **options))
+    return _chunks(f, pd.read_csv(stream, chunksize=chunksize, **options))
+
+
+def _chunks(f, reader):
+    with f, reader:
+        for chunk in reader:
+            yield apply_schema(chunk)
+
+
+def _parse(path, mark):
+    return read_csv_range(path, 0, mark.offset)
+
+
+# Rows appended after the previous version
+def _parse_appended(path, entry, start, end):
+    return read_csv_range(path, start, end, names=list(entry.df.columns))
+
+
+# Return the cached dataset entry for a path, re-parsing only when the file content changed.
+# Size/mtime are checked on every call. When the file only grew, just the appended lines are
+# parsed and hashed; otherwise the content hash is recomputed, so touching the file or copying it
+# in place without changes keeps the parsed frame.
+def get_dataset(path=DATASET_PATH):
+    path = os.path.abspath(path)
+    stat = file_stat(path)
+
+    with _datasets_lock:
+        entry = _datasets.get(path)
+        if entry is not None and entry.stat == stat:
+            return entry
+
+        if entry is not None:
+            appended = appended_range(path, entry.mark)
+            if appended is not None and appended[1] > appended[0]:
+                start, end = appended
+                tail = _parse_appended(path, entry, start, end)
+                df = concat_rows(entry.df, tail)
+                entry = LoadedDataset(path, stat, entry.mark.extend(path, end), df, parent=entry.fingerprint,
+                                      appended=tail)
+                _datasets[path] = entry
+                return entry
+
+        mark = ingest_mark(path)
+        if entry is not None and entry.fingerprint == mark.fingerprint:
+            entry.stat = stat
+            return entry
+
+        entry = LoadedDataset(path, stat, mark, _parse(path, mark))
+        _datasets[path] = entry
+        return entry
+
+
+# Seed the cache with an already parsed version of a file (e.g. from a startup snapshot), unless
+# a version of that file was loaded meanwhile (or replacing it, with `replace`). Returns the cached
+# entry.
+def install_dataset(entry, replace=False):
+    with _datasets_lock:
+        if replace:
+            _datasets[entry.path] = entry
+            return entry
+        return _datasets.setdefault(entry.path, entry)
+
+
+# Seed the cache with a version of a file whose rows were loaded elsewhere (a startup snapshot, the
+# column store), covering the file up to `offset`. When the file still has the size/mtime `stat`
+# and the bytes before the offset match `probe`, both recorded with the rows, the recorded
+# fingerprint is trusted and the file is only hashed if rows are appended later, so a cold start
+# costs no pass over the CSV. Otherwise the file is hashed up to the offset and rows of other
+# content are refused. Rows appended after the offset are parsed on the next load, like any other
+# append. Returns the installed entry, or None when refused or a version was loaded meanwhile
+# (unless `replace` lets it supersede that version).
+def install_version(path, offset, fingerprint, df, replace=False, stat=None, probe=None):
+    path = os.path.abspath(path)
+    try:
+        recorded = stat
+        stat = file_stat(path)
+        if recorded is not None and tuple(recorded) == stat and _probe(path, offset) == probe:
+            mark = IngestMark(offset, None, probe, fingerprint)
+        else:
+            mark = ingest_mark(path, end=offset)
+        complete = complete_lines_end(path) == mark.offset
+    except OSError:
+        return None
+    if mark.fingerprint != fingerprint:
+        return None
+
+    # An incomplete stat makes the next load look for the appended rows
+    entry = LoadedDataset(path, stat if complete else None, mark, df)
+    return entry if install_dataset(entry, replace) is entry else None
+
+
+# Whether a version of the file is already parsed in this process
+def dataset_loaded(path=DATASET_PATH):
+    with _datasets_lock:
+        return os.path.abspath(path) in _datasets
+
+
+# Version of the file parsed in this process, if any, without looking at the file
+def loaded_dataset(path=DATASET_PATH):
+    with _datasets_lock:
+        return _datasets.get(os.path.abspath(path))
+
+
+# Shared parsed frame for a dataset file. It is served to every session at once, so treat it as
+# read-only; derived columns belong in derived.py.
+def load_dataset(path=DATASET_PATH):
+    return get_dataset(path).df
+
+
+# Content fingerprint of the currently loaded dataset version
+def dataset_version(path=DATASET_PATH):
+    return get_dataset(path).fingerprint
+
+
+# Drop cached frames (all of them, or only the one for the given path)
+def clear_dataset_cache(path=None):
+    with _datasets_lock:
+        if path is None:
+            _datasets.clear()
+        else:
+            _datasets.pop(os.path.abspath(path), None)
+
+
+# Bytes per column of a dataset with read_csv's inferred types ('before') and with the schema
+# ('after'), with a total row
+def memory_report(path=DATASET_PATH):
+    inferred = pd.read_csv(path)
+    typed = read_csv_range(path, 0, complete_lines_end(path))
+    report = pd.DataFrame({'type before': inferred.dtypes.astype(str),
+                           'bytes before': inferred.memory_usage(deep=True, index=False),
+                           'type after': typed.dtypes.astype(str),
+                           'bytes after': typed.memory_usage(deep=True, index=False)})
+    report.loc['Total'] = ['', report['bytes before'].sum(), '', report['bytes after'].sum()]
+    report['ratio'] = report['bytes before'] / report['bytes after']
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report the bytes per column of a dataset before and after '
+                                                 'applying the column schema.')
+    parser.add_argument('--dataset', default=DATASET_PATH, help='CSV file to measure')
+    args = parser.parse_args()
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(memory_report(args.dataset).round(1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import os
+import threading
+
+import pandas as pd
+
+from data_loader import DATASET_PATH, get_dataset
+
+# Bins behind the derived dimension columns
+AGE_RANGE_BINS = [0, 18, 25, 35, 45, 60, 100]
+AGE_RANGE_LABELS = ['<18', '18-25', '26-35', '36-45', '46-60', '60+']
+AGE_GROUP_BINS = list(range(10, 81, 10))
+AGE_GROUP_LABELS = [f"{i}-{i + 9}" for i in AGE_GROUP_BINS[:-1]]
+TIME_BINS = list(range(0, 76, 2))
+TIME_BIN_LABELS = [f'{TIME_BINS[i]}-{TIME_BINS[i + 1]}' for i in range(len(TIME_BINS) - 1)]
+PURCHASE_BINS = list(range(0, 1001, 100)) + [float('inf')]
+PURCHASE_BIN_LABELS = [f'{PURCHASE_BINS[i]}-{PURCHASE_BINS[i + 1]}' for i in range(len(PURCHASE_BINS) - 2)] + ['1000+']
+
+
+def _z_score(df):
+    purchase = df['Purchase Amount ($)']
+    return (purchase - purchase.mean()) / purchase.std()
+
+
+def _age_range(df):
+    return pd.cut(df['Age'], bins=AGE_RANGE_BINS, labels=AGE_RANGE_LABELS, right=False)
+
+
+def _age_group(df):
+    return pd.cut(df['Age'], bins=AGE_GROUP_BINS, labels=AGE_GROUP_LABELS, right=False)
+
+
+def _time_bins(df):
+    return pd.cut(df['Time Spent on Website (min)'], bins=TIME_BINS, labels=TIME_BIN_LABELS, right=False)
+
+
+def _purchase_bins(df):
+    return pd.cut(df['Purchase Amount ($)'], bins=PURCHASE_BINS, labels=PURCHASE_BIN_LABELS, right=False)
+
+
+# Columns computed from the base data, by name
+DERIVED_COLUMNS = {
+    'Z-score': _z_score,
+    'Age Range': _age_range,
+    'Age Group': _age_group,
+    'Time Bins': _time_bins,
+    'Purchase Bins': _purchase_bins,
+}
+
+
+# Compute a derived column for any frame without touching it
+def compute_column(df, name):
+    return DERIVED_COLUMNS[name](df).rename(name)
+
+
+# Derived columns of one dataset version. Each column is computed on first use and kept next to
+# the shared base frame, which is never written to, so every session can read both concurrently.
+class DerivedColumns:
+    def __init__(self, df):
+        self.base = df
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        if name not in DERIVED_COLUMNS:
+            return self.base[name]
+        with self._lock:
+            column = self._columns.get(name)
+            if column is None:
+                column = compute_column(self.base, name)
+                self._columns[name] = column
+            return column
+
+    # New frame holding the requested base and derived columns (the base frame stays as it is)
+    def frame(self, *names):
+        return pd.DataFrame({name: self[name] for name in names})
+
+    # Columns computed so far are pickled with the base frame (the lock is recreated)
+    def __getstate__(self):
+        with self._lock:
+            return {'base': self.base, 'columns': dict(self._columns)}
+
+    def __setstate__(self, state):
+        self.base = state['base']
+        self._columns = state['columns']
+        self._lock = threading.Lock()
+
+
+_derived = {}
+_derived_lock = threading.Lock()
+
+
+# Derived columns for the current version of a dataset file
+def load_derived(path=DATASET_PATH):
+    entry = get_dataset(path)
+    key = (entry.path, entry.fingerprint)
+    with _derived_lock:
+        derived = _derived.get(key)
+        if derived is None or derived.base is not entry.df:
+            for stale in [k for k in _derived if k[0] == entry.path]:
+                del _derived[stale]
+            derived = DerivedColumns(entry.df)
+            _derived[key] = derived
+        return derived
+
+
+# Seed the cache with derived columns of a dataset entry (e.g. from a startup snapshot)
+def install_derived(entry, derived):
+    with _derived_lock:
+        return _derived.setdefault((entry.path, entry.fingerprint), derived)
+
+
+# Drop cached derived columns (all of them, or only those of the given path)
+def clear_derived_cache(path=None):
+    with _derived_lock:
+        for key in [k for k in _derived if path is None or k[0] == os.path.abspath(path)]:
+            del _derived[key]
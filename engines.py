@@ -0,0 +1,190 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregates import (CORRELATION_DIMENSIONS, DIMENSIONS, ENGINES, MEASURES, PAIRS, QUANTILE_DIMENSIONS,
+                        QUANTILE_MEASURES, AggregateCube, GroupStats, build_correlations, build_cube, build_sketches,
+                        dimension_values, encode_dimension)
+from bitmaps import FILTER_COLUMNS, Filters
+from data_loader import DATASET_PATH, get_dataset
+from derived import DERIVED_COLUMNS, load_derived
+
+# Worker threads of the DuckDB engine (default: one per core)
+ENGINE_THREADS = int(os.environ.get('STATICA_ENGINE_THREADS', '0')) or os.cpu_count() or 1
+
+# Relative tolerance of the engine parity check: the engines sum in different orders
+PARITY_RTOL = 1e-9
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        raise RuntimeError("The 'duckdb' query engine needs the duckdb package (pip install duckdb)") from None
+    return duckdb
+
+
+# Aggregate cube computed by DuckDB, in process and on ENGINE_THREADS threads. The rows are
+# scanned in place (categoricals as their codes) by one query with a grouping set per dimension
+# and dimension pair. The result holds the same arrays as AggregateCube, so lookups, merges and
+# pickling are shared with it; the connection is closed once the cube is built.
+class DuckDBCube(AggregateCube):
+    def __init__(self, df, dimensions=DIMENSIONS, measures=MEASURES, pairs=PAIRS, derived=None,
+                 threads=ENGINE_THREADS):
+        duckdb = _duckdb()
+        self.rows = len(df)
+        self.measures = list(measures)
+        self._measure_index = {m: i for i, m in enumerate(self.measures)}
+        m = len(self.measures)
+
+        dims = {dim: dimension_values(df, dim, derived) for dim in dimensions}
+        names = {dim: f'd{k}' for k, dim in enumerate(dimensions)}
+        table = pd.DataFrame({names[dim]: column.cat.codes if isinstance(column.dtype, pd.CategoricalDtype)
+                              else column for dim, column in dims.items()}, copy=False)
+        for i, measure in enumerate(self.measures):
+            table[f'm{i}'] = df[measure].to_numpy()
+        measure_columns = [f'm{i}::DOUBLE' for i in range(m)]
+
+        keys = [(dim,) for dim in dimensions] + [tuple(pair) for pair in pairs]
+        columns = [names[dim] for dim in dimensions]
+        grouping_sets = ', '.join(f"({', '.join(names[dim] for dim in key)})" for key in keys)
+        statistics = ([f'count({x})' for x in measure_columns] + [f'coalesce(sum({x}), 0)' for x in measure_columns]
+                      + [f'coalesce(sum({x} * {x}), 0)' for x in measure_columns])
+
+        with duckdb.connect(config={'threads': threads}) as connection:
+            connection.execute('SET enable_progress_bar = false')
+            connection.register('customers', table)
+            grouped = connection.execute(
+                f"SELECT grouping({', '.join(columns)}) AS grouping_id, {', '.join(columns)}, count(*) AS rows, "
+                f"{', '.join(statistics)} FROM customers GROUP BY GROUPING SETS ({grouping_sets})").fetchdf()
+
+        # The totals and correlation statistics are a few matrix products, left to numpy as in AggregateCube
+        values = np.column_stack([df[measure].to_numpy(dtype=np.float64) for measure in self.measures])
+        valid = ~np.isnan(values)
+        self._moments(valid, np.where(valid, values, 0.0))
+
+        # Rows of each grouping set, marked by the bits of the columns it does not group by
+        sets = {}
+        for key in keys:
+            mask = sum(1 << (len(columns) - 1 - columns.index(names[dim])) for dim in dimensions if dim not in key)
+            rows = grouped[grouped['grouping_id'] == mask]
+            sets[key] = rows.dropna(subset=[names[dim] for dim in key])
+
+        self.labels = {}
+        for dim, column in dims.items():
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                self.labels[dim] = pd.Index(column.cat.categories)
+            else:
+                present = sets[(dim,)][names[dim]]
+                self.labels[dim] = pd.Index(present.unique()).sort_values().astype(column.dtype)
+
+        self._groups = {}
+        for key in keys:
+            rows = sets[key]
+            positions = []
+            for dim in key:
+                column = rows[names[dim]]
+                if isinstance(dims[dim].dtype, pd.CategoricalDtype):
+                    positions.append(column.to_numpy(dtype=np.int64))
+                else:
+                    positions.append(self.labels[dim].get_indexer(column.astype(self.labels[dim].dtype)))
+            present = np.all([p >= 0 for p in positions], axis=0)
+            positions = tuple(p[present] for p in positions)
+            shape = tuple(len(self.labels[dim]) for dim in key)
+
+            count = np.zeros(shape, dtype=np.int64)
+            count[positions] = rows['rows'].to_numpy(dtype=np.int64)[present]
+            stacked = np.zeros(shape + (3 * m,), dtype=np.float64)
+            stacked[positions] = rows.iloc[:, len(columns) + 2:].to_numpy(dtype=np.float64)[present]
+            self._groups[key] = GroupStats(key, [self.labels[dim] for dim in key], count,
+                                           stacked[..., :m], stacked[..., m:2 * m], stacked[..., 2 * m:])
+
+        codes = {}
+        for dim in set(QUANTILE_DIMENSIONS) | set(CORRELATION_DIMENSIONS):
+            codes[dim], _ = encode_dimension(dims[dim])
+        self.sketches = build_sketches({measure: values[:, self._measure_index[measure]]
+                                        for measure in QUANTILE_MEASURES}, codes, self.labels)
+        self.correlations = build_correlations(values, codes, self.labels, self.measures)
+
+
+# Filter scopes the parity check runs under: all rows, then the first value of each sidebar
+# filter on its own, so groups go missing the way they do in filtered views
+def parity_scopes(df):
+    scopes = [Filters()]
+    for column in FILTER_COLUMNS:
+        scopes.append(Filters(values={column: [df[column].cat.categories[0]]}))
+    return scopes
+
+
+def _same(expected, actual):
+    if isinstance(expected, (pd.DataFrame, pd.Series)):
+        try:
+            if isinstance(expected, pd.DataFrame):
+                pd.testing.assert_frame_equal(expected, actual, check_exact=False, rtol=PARITY_RTOL)
+            else:
+                pd.testing.assert_series_equal(expected, actual, check_exact=False, rtol=PARITY_RTOL)
+        except AssertionError:
+            return False
+        return True
+    if isinstance(expected, (float, np.floating)) or isinstance(actual, (float, np.floating)):
+        return bool(np.isclose(expected, actual, rtol=PARITY_RTOL, atol=0, equal_nan=True))
+    if isinstance(expected, (list, tuple)):
+        return (isinstance(actual, (list, tuple)) and len(expected) == len(actual)
+                and all(_same(e, a) for e, a in zip(expected, actual)))
+    return expected == actual
+
+
+# Answer every dashboard question with each engine, on all rows and in a few filtered scopes, and
+# list the values and tables that differ from the first engine's as (scope key, question, name)
+def check_parity(path=DATASET_PATH, engines=ENGINES):
+    from questions import COMPUTE, DashboardData, compute_question, filtered_data, load_dashboard_data
+
+    base = load_dashboard_data(path, streaming=False)
+    results = {}
+    for engine in engines:
+        data = DashboardData(build_cube(base.df, derived=base.derived, engine=engine), f'{base.version}:{engine}',
+                             base.df, base.derived, index=base.index)
+        for filters in parity_scopes(base.df):
+            scoped = filtered_data(data, filters)
+            for question in COMPUTE:
+                if scoped.rows:
+                    results[(engine, filters.key, question)] = compute_question(question, scoped)
+
+    mismatches = []
+    for (engine, scope, question), result in results.items():
+        expected = results[(engines[0], scope, question)]
+        for name in [*expected.values, *expected.tables]:
+            if not _same(expected[name], result[name]):
+                mismatches.append((engine, scope, question, name))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that every query engine gives the same answers, and time '
+                                                 'the cube build of each.')
+    parser.add_argument('--dataset', default=DATASET_PATH, help='CSV file to check')
+    parser.add_argument('--engines', nargs='+', default=ENGINES, choices=ENGINES, help='engines to compare')
+    args = parser.parse_args()
+
+    entry = get_dataset(args.dataset)
+    derived = load_derived(args.dataset)
+    for name in DERIVED_COLUMNS:
+        derived[name]
+    for engine in args.engines:
+        start = time.perf_counter()
+        build_cube(entry.df, derived=derived, engine=engine)
+        print(f"{engine}: cube of {len(entry.df):,} rows built in {time.perf_counter() - start:.3f} s")
+
+    mismatches = check_parity(args.dataset, args.engines)
+    for engine, scope, question, name in mismatches:
+        print(f"{engine} differs from {args.engines[0]}: {question} {name} (filters {scope})")
+    print('Engines agree' if not mismatches else f'{len(mismatches)} differences')
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
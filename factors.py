@@ -0,0 +1,167 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+# Column whose drivers the factor analysis looks for
+TARGET = 'Return Customer'
+
+# Features tested for association with the target through their contingency tables: the
+# categorical columns, plus the numeric ones through their bins (or values, when they are small
+# integers)
+CATEGORICAL_FACTORS = ['Gender', 'Location', 'Product Category', 'Device Type', 'Payment Method',
+                       'Subscription Status', 'Customer Satisfaction', 'Discount Availed', 'Review Score (1-5)',
+                       'Number of Items Purchased', 'Delivery Time (days)', 'Age Group', 'Time Bins',
+                       'Purchase Bins']
+
+# Numeric features whose averages are compared between target and other customers
+NUMERIC_FACTORS = ['Age', 'Purchase Amount ($)', 'Time Spent on Website (min)', 'Number of Items Purchased',
+                   'Review Score (1-5)', 'Delivery Time (days)']
+
+# Level of the confidence intervals
+CONFIDENCE = 0.95
+
+# Associations with a p-value below this are flagged significant
+SIGNIFICANCE = 0.05
+
+
+# Regularized upper incomplete gamma function Q(a, x), by its series below a + 1 and its continued
+# fraction above (Numerical Recipes, gammq)
+def _gamma_q(a, x, iterations=500, epsilon=1e-15):
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        term = total = 1.0 / a
+        for n in range(1, iterations):
+            term *= x / (a + n)
+            total += term
+            if abs(term) < abs(total) * epsilon:
+                break
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for n in range(1, iterations):
+        an = -n * (n - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < epsilon:
+            break
+    return math.exp(log_prefix) * h
+
+
+# P(X >= x) for a chi-square distribution with `dof` degrees of freedom
+def chi2_sf(x, dof):
+    if dof <= 0:
+        return 1.0
+    return _gamma_q(dof / 2, x / 2)
+
+
+def _z(confidence):
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+# Customers with and without the target per label of a feature (labels without customers are
+# dropped), from the group counts of the aggregate store: the cube builds every one of these in its
+# single bincount pass over the codes, so no rows are read here
+def contingency_table(cube, feature, target=TARGET):
+    customers = cube.count(feature)
+    positives = cube.sum(target, feature).reindex(customers.index, fill_value=0)
+    table = pd.DataFrame({'Other': customers - positives, target: positives})
+    return table[customers > 0].astype(np.float64)
+
+
+# Chi-square test of independence, Cramér's V and mutual information (bits) of a contingency table
+def association(table):
+    observed = table.to_numpy(dtype=np.float64)
+    observed = observed[:, observed.sum(axis=0) > 0]
+    total = observed.sum()
+    if total == 0 or min(observed.shape) < 2:
+        return {'chi2': 0.0, 'dof': 0, 'p_value': 1.0, 'cramers_v': 0.0, 'mutual_information': 0.0}
+    rows = observed.sum(axis=1, keepdims=True)
+    columns = observed.sum(axis=0, keepdims=True)
+    expected = rows * columns / total
+    chi2 = float(((observed - expected) ** 2 / expected).sum())
+    dof = (observed.shape[0] - 1) * (observed.shape[1] - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(observed > 0, observed / total * np.log2(observed * total / (rows * columns)), 0.0)
+    return {'chi2': chi2, 'dof': dof, 'p_value': chi2_sf(chi2, dof),
+            'cramers_v': math.sqrt(chi2 / (total * (min(observed.shape) - 1))),
+            'mutual_information': float(terms.sum())}
+
+
+# Target rate per label of a feature with Wilson score intervals
+def target_rates(table, target=TARGET, confidence=CONFIDENCE):
+    z = _z(confidence)
+    n = table.sum(axis=1)
+    rate = table[target] / n
+    center = (rate + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * np.sqrt(rate * (1 - rate) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return pd.DataFrame({'Customers': n.astype(np.int64), 'Rate (%)': rate * 100,
+                         'CI low (%)': (center - half) * 100, 'CI high (%)': (center + half) * 100})
+
+
+# Association of every categorical feature with the target, strongest (largest Cramér's V) first.
+# The effect size is the gap between the labels with the highest and lowest target rate, with a
+# Wald interval. Also returns the target rate per label of every feature, with the labels as text
+# since features mix flags, numbers and categories.
+def categorical_factors(cube, features=CATEGORICAL_FACTORS, target=TARGET, confidence=CONFIDENCE):
+    z = _z(confidence)
+    rows = []
+    rates = []
+    for feature in features:
+        table = contingency_table(cube, feature, target)
+        test = association(table)
+        rate = target_rates(table, target, confidence)
+        rates.append(rate.rename_axis('Level').reset_index().astype({'Level': str}).assign(Feature=feature))
+        p = table[target] / table.sum(axis=1)
+        high, low = p.idxmax(), p.idxmin()
+        gap = p[high] - p[low]
+        n_high, n_low = table.loc[high].sum(), table.loc[low].sum()
+        se = math.sqrt(p[high] * (1 - p[high]) / n_high + p[low] * (1 - p[low]) / n_low)
+        rows.append({'Feature': feature, 'Levels': len(table), 'Chi-square': test['chi2'], 'DoF': test['dof'],
+                     'p-value': test['p_value'], "Cramér's V": test['cramers_v'],
+                     'Mutual information (bits)': test['mutual_information'],
+                     'Highest rate': str(high), 'Lowest rate': str(low), 'Rate gap (pp)': gap * 100,
+                     'Gap CI low (pp)': (gap - z * se) * 100, 'Gap CI high (pp)': (gap + z * se) * 100,
+                     'Significant': test['p_value'] < SIGNIFICANCE})
+    factors = pd.DataFrame(rows).sort_values("Cramér's V", ascending=False, kind='stable').reset_index(drop=True)
+    rates = pd.concat(rates, ignore_index=True)[['Feature', 'Level', 'Customers', 'Rate (%)', 'CI low (%)',
+                                                 'CI high (%)']]
+    return factors, rates
+
+
+# Mean of every numeric feature for target and other customers: the difference with a Welch
+# interval, Cohen's d with its large-sample interval, and the point-biserial correlation, largest
+# |d| first. Uses only the per-group moments of the aggregate store.
+def numeric_factors(cube, features=NUMERIC_FACTORS, target=TARGET, confidence=CONFIDENCE):
+    z = _z(confidence)
+    n = cube.count(target).reindex([False, True], fill_value=0).astype(np.float64)
+    rows = []
+    for feature in features:
+        mean = cube.mean(feature, target).reindex([False, True])
+        var = cube.var(feature, target).reindex([False, True])
+        n0, n1 = n[False], n[True]
+        diff = mean[True] - mean[False]
+        se = math.sqrt(var[True] / n1 + var[False] / n0) if n0 > 1 and n1 > 1 else np.nan
+        pooled = math.sqrt(((n1 - 1) * var[True] + (n0 - 1) * var[False]) / (n0 + n1 - 2)) if n0 > 1 and n1 > 1 \
+            else np.nan
+        d = diff / pooled if pooled else np.nan
+        se_d = math.sqrt((n0 + n1) / (n0 * n1) + d * d / (2 * (n0 + n1))) if n0 > 1 and n1 > 1 else np.nan
+        rows.append({'Feature': feature, 'Mean (return)': mean[True], 'Mean (other)': mean[False],
+                     'Difference': diff, 'CI low': diff - z * se, 'CI high': diff + z * se,
+                     "Cohen's d": d, 'd CI low': d - z * se_d, 'd CI high': d + z * se_d,
+                     'Point-biserial r': cube.corr(feature, target)})
+    effects = pd.DataFrame(rows)
+    order = effects["Cohen's d"].abs().sort_values(ascending=False, kind='stable').index
+    return effects.loc[order].reset_index(drop=True)
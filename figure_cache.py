@@ -0,0 +1,205 @@
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Plot styling that cached figures depend on; change it to invalidate every cached figure
+FIGURE_THEME = 'default'
+
+# Rendered figures persist here between server restarts
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".figure_cache")
+
+# Figures missing from the cache are drawn in a pool of render threads (charts use the object-oriented
+# Matplotlib API, so concurrent draws share no state; the report builder draws them in processes)
+RENDER_WORKERS = int(os.environ.get('STATICA_RENDER_WORKERS', '0')) or os.cpu_count() or 1
+
+# Same savefig options st.pyplot uses, so cached images look like the directly rendered ones
+SAVEFIG_OPTIONS = {'bbox_inches': 'tight', 'dpi': 200}
+
+
+# Stable cache key for one figure of a question, given the filter state, data version and theme
+def figure_key(question, figure, filters=None, data_version=None, theme='default', image_format='png'):
+    payload = json.dumps([question, figure, filters, data_version, theme, image_format], sort_keys=True,
+                         default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+
+
+# Serialize a figure to image bytes and release the figure. Its artists are cleared at once: a
+# figure is full of reference cycles, so left alone it would hold its memory until the next cyclic
+# garbage collection. Figures made through pyplot are also closed; pyplot is never imported here,
+# so the dashboard only loads the plotting libraries once it draws.
+def render_figure(fig, image_format='png'):
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format=image_format, **SAVEFIG_OPTIONS)
+    finally:
+        fig.clear()
+        pyplot = sys.modules.get('matplotlib.pyplot')
+        if pyplot is not None:
+            pyplot.close(fig)
+    return buffer.getvalue()
+
+
+# Draw and serialize one figure in a render worker; returns the image bytes and the seconds spent
+def draw_figure(draw, args, image_format='png'):
+    start = time.perf_counter()
+    data = render_figure(draw(*args), image_format)
+    return data, time.perf_counter() - start
+
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+# Process-wide render pool, started on first use
+def render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ThreadPoolExecutor(RENDER_WORKERS, thread_name_prefix='figure-render')
+        return _render_pool
+
+
+# Two-tier cache of rendered figure bytes: a bounded in-memory LRU in front of a size-capped
+# directory. Disk entries are touched on every hit, and the least recently used files are evicted
+# once the directory grows past max_disk_bytes.
+class FigureCache:
+    def __init__(self, directory=CACHE_DIR, max_memory_items=128, max_disk_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+
+        self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        self._remember(key, data)
+        if self.max_disk_bytes <= 0:
+            return
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The disk tier is best effort; the memory tier still serves this figure
+            return
+
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data)
+        self._evict_disk()
+
+    # Cached bytes for key, calling draw(*args) and rendering its figure only on a miss
+    def get_or_render(self, key, draw, *args, image_format='png'):
+        data = self.get(key)
+        if data is None:
+            data = render_figure(draw(*args), image_format)
+            self.put(key, data)
+        return data
+
+    # Future of (image bytes, seconds spent rendering) for key. Cached figures resolve at once;
+    # otherwise draw(*args) runs in the render pool and the result is cached when it completes.
+    # Concurrent requests for a figure that is still rendering share the same future.
+    def submit(self, key, draw, *args, image_format='png', pool=None):
+        data = self.get(key)
+        if data is not None:
+            future = Future()
+            future.set_result((data, 0.0))
+            return future
+
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            future = (pool or render_pool()).submit(draw_figure, draw, args, image_format)
+            self._pending[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def _finish(self, key, future):
+        if not future.cancelled() and future.exception() is None:
+            self.put(key, future.result()[0])
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._disk_bytes = None
+        for path, _, _ in self._disk_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _remember(self, key, data):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def _disk_entries(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict_disk(self):
+        with self._lock:
+            if self._disk_bytes is not None and self._disk_bytes <= self.max_disk_bytes:
+                return
+            entries = self._disk_entries()
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+                if total <= self.max_disk_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._disk_bytes = total
+
+
+# Process-wide cache shared by every session
+figure_cache = FigureCache()
@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from sketches import QuantileSketch
+
+# Set STATICA_ADMIN=1 to show the timing panel in the dashboard sidebar
+ADMIN = os.environ.get('STATICA_ADMIN') == '1'
+
+# When set, the dashboards write their metrics here after every run (JSON and Prometheus text)
+METRICS_DIR = os.environ.get('STATICA_METRICS_DIR')
+
+# Upper bounds (seconds) of the Prometheus histogram buckets
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+# Percentiles reported per question and phase
+LATENCY_PERCENTILES = {'p50': 0.5, 'p95': 0.95, 'p99': 0.99}
+
+# Samples per histogram kept verbatim (exact percentiles) before its sketch starts compacting;
+# small so that recording one sample never copies a long buffer
+LATENCY_EXACT_SAMPLES = 1000
+
+
+# Latency distribution of one (question, phase, figure): bucket counts for Prometheus and a
+# quantile sketch for the percentiles (exact up to LATENCY_EXACT_SAMPLES samples)
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.sketch = QuantileSketch(exact_threshold=LATENCY_EXACT_SAMPLES)
+
+    def observe(self, seconds):
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self.sketch.update([seconds])
+
+    def percentile(self, q):
+        return self.sketch.quantile(q)
+
+
+# Timings of one run of a question. Spans of the same phase add up (a page renders several
+# figures); spans naming a figure are also recorded on their own. finish() records the phase
+# totals and the overall total.
+class Trace:
+    def __init__(self, registry, question):
+        self.registry = registry
+        self.question = question
+        self.phases = {}
+        self.finished = False
+
+    @contextmanager
+    def span(self, phase, figure=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start, figure)
+
+    def add(self, phase, seconds, figure=None):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        if figure is not None:
+            self.registry.record(self.question, phase, seconds, figure)
+
+    # Time one figure spent in a phase without adding it to the phase total (figures rendered in
+    # parallel overlap, so the page's render time is measured as the time spent waiting for them)
+    def figure(self, phase, figure, seconds):
+        self.registry.record(self.question, phase, seconds, figure)
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        for phase, seconds in self.phases.items():
+            self.registry.record(self.question, phase, seconds)
+        self.registry.record(self.question, 'total', sum(self.phases.values()))
+
+
+# Process-wide latency histograms keyed by (question, phase, figure); safe to use from every
+# session and thread of the Streamlit server
+class Metrics:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self.startup = None
+        self.startup_source = None
+
+    def trace(self, question):
+        return Trace(self, question)
+
+    def record(self, question, phase, seconds, figure=None):
+        key = (question, phase, figure)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    # Seconds per startup phase of this server process and where its data came from ('csv',
+    # 'snapshot', 'store' or 'server'), recorded as question 'startup' by the first call only
+    def record_startup(self, phases, source=None):
+        with self._lock:
+            if self.startup is not None:
+                return
+            self.startup = dict(phases)
+            self.startup_source = source
+        for phase, seconds in phases.items():
+            self.record('startup', phase, seconds)
+        self.record('startup', 'total', sum(phases.values()))
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    # One row per (question, phase, figure): count, mean, p50/p95/p99 and max in seconds
+    def summary(self):
+        with self._lock:
+            rows = []
+            for (question, phase, figure), histogram in sorted(self._histograms.items(),
+                                                               key=lambda item: tuple(str(k) for k in item[0])):
+                row = {'question': question, 'phase': phase, 'figure': figure, 'count': histogram.count,
+                       'mean': histogram.sum / histogram.count}
+                row.update({name: histogram.percentile(q) for name, q in LATENCY_PERCENTILES.items()})
+                row['max'] = histogram.max
+                rows.append(row)
+        return pd.DataFrame(rows, columns=['question', 'phase', 'figure', 'count', 'mean',
+                                           *LATENCY_PERCENTILES, 'max'])
+
+    def to_json(self):
+        return json.dumps(self.summary().to_dict(orient='records'), indent=2)
+
+    # Prometheus text exposition format: one histogram per (question, phase, figure) plus the
+    # percentiles as gauges
+    def to_prometheus(self):
+        lines = ['# HELP statica_question_seconds Time spent per dashboard question and phase.',
+                 '# TYPE statica_question_seconds histogram']
+        quantile_lines = ['# HELP statica_question_seconds_quantile Latency percentiles per question and phase.',
+                          '# TYPE statica_question_seconds_quantile gauge']
+        with self._lock:
+            for (question, phase, figure), histogram in sorted(self._histograms.items(),
+                                                               key=lambda item: tuple(str(k) for k in item[0])):
+                labels = f'question="{question}",phase="{phase}"'
+                if figure is not None:
+                    labels += f',figure="{figure}"'
+                bounds = [str(bound) for bound in histogram.buckets] + ['+Inf']
+                cumulative = 0
+                for bound, count in zip(bounds, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'statica_question_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'statica_question_seconds_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'statica_question_seconds_count{{{labels}}} {histogram.count}')
+                for q in LATENCY_PERCENTILES.values():
+                    quantile_lines.append(
+                        f'statica_question_seconds_quantile{{{labels},quantile="{q}"}} {histogram.percentile(q)}')
+        return '\n'.join(lines + quantile_lines) + '\n'
+
+    # Write metrics.json and metrics.prom to a directory, replacing the previous files atomically
+    def write(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for filename, text in [('metrics.json', self.to_json()), ('metrics.prom', self.to_prometheus())]:
+            path = os.path.join(directory, filename)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+
+
+# Shared by every session of the server process
+metrics = Metrics()
@@ -0,0 +1,591 @@
+import os
+import threading
+from collections import OrderedDict
+from importlib import import_module
+
+import numpy as np
+import pandas as pd
+
+from aggregates import CORRELATION_DIMENSIONS, load_cube
+from bitmaps import Filters, load_bitmap_index
+from data_loader import DATASET_PATH, dataset_version, load_dataset
+from derived import DerivedColumns, load_derived
+from factors import CONFIDENCE, SIGNIFICANCE, TARGET, categorical_factors, numeric_factors
+from streaming import STREAMING, load_streaming_aggregates
+
+# Dashboard levels and their questions, in menu order
+LEVELS = {
+    'Level 1: Basic Insights': [
+        'Q1: Find Mean, Median, and Mode (Age)',
+        'Q2: Find variance, standard deviation, and z-score (Purchase Amount)',
+        'Q3: Top three product categories based on purchases',
+        'Q4: How many customers are classified as return customers?',
+        'Q5: Average review score given by customers',
+        'Q6: Average delivery time by subscription status (Free, Premium)',
+        'Q7: Number of customers subscribed to the service',
+        'Q8: Percentage of customers using different devices (Mobile, Desktop, Tablet)',
+        'Q9: Average purchase amount with and without discounts',
+        'Q10: Most common payment method used by customers'],
+    'Level 2: Intermediate Insights': [
+        'Q1: Average review scores of users of the most common payment method',
+        'Q2: Correlation between time on site and purchase amount',
+        'Q3: Percentage of satisfied (rating 4-5) return customers',
+        'Q4: Relationship between number of items purchased and satisfaction',
+        'Q5: Location with 2nd highest average purchase amount',
+        'Q6: Correlations between the numeric columns, overall and by location or product category'],
+    'Level 3: Critical Thinking Insights': [
+        'Q1: Factors contributing to being classified as a return customer',
+        'Q2: How payment methods influence customer satisfaction and return rates',
+        'Q3: How location influences both purchase amount and delivery time',
+        'Q4: Major insights with explanation'],
+}
+
+# (question id, level, title) of every question, e.g. ('level1_q3', 'Level 1: Basic Insights', 'Q3: ...')
+QUESTIONS = [(f'level{i}_q{j}', level, title)
+             for i, (level, titles) in enumerate(LEVELS.items(), start=1)
+             for j, title in enumerate(titles, start=1)]
+
+# From this many rows on the Z-score plot is drawn as a density image instead of one marker per row
+Z_SCORE_DENSITY_THRESHOLD = int(os.environ.get('STATICA_Z_SCORE_DENSITY_THRESHOLD', '10000'))
+
+# Percentiles shown next to averages
+PERCENTILES = [0.25, 0.5, 0.75, 0.9]
+PERCENTILE_LABELS = {0.25: 'P25', 0.5: 'Median', 0.75: 'P75', 0.9: 'P90'}
+
+
+# Filtered views kept per process, most recently used last
+MAX_FILTERED_VIEWS = 32
+
+
+# Everything the questions read: aggregates, plus the rows and derived columns unless streaming.
+# In memory, `index` is the bitmap index of the whole dataset version and `scope` the bitmap of the
+# rows the filters select (None for all rows); the other fields cover only those rows. `results`
+# keeps the results computed on a filtered view.
+class DashboardData:
+    def __init__(self, cube, version, df=None, derived=None, streaming=False, index=None, filters=None,
+                 scope=None):
+        self.cube = cube
+        self.version = version
+        self.df = df
+        self.derived = derived
+        self.streaming = streaming
+        self.index = index
+        self.filters = filters or Filters()
+        self.scope = scope
+        self.results = {}
+
+    @property
+    def rows(self):
+        return self.cube.rows
+
+
+# Data for the current version of the dataset (shared, cached loaders; never modified)
+def load_dashboard_data(path=DATASET_PATH, streaming=STREAMING):
+    if streaming:
+        cube = load_streaming_aggregates(path)
+        return DashboardData(cube, cube.fingerprint, streaming=True)
+    return DashboardData(load_cube(path), dataset_version(path), load_dataset(path), load_derived(path),
+                         index=load_bitmap_index(path))
+
+
+_filtered = OrderedDict()
+_filtered_lock = threading.Lock()
+
+
+# The data re-scoped to the rows the filters select: resolved on the bitmap index, then aggregated
+# into a cube of its own (by the engine of the full cube), so every question runs unchanged on the
+# subset. Views are shared by every session showing the same filters on the same dataset version.
+# Streaming keeps no rows to filter, so its data is returned as it is.
+def filtered_data(data, filters):
+    if not filters or data.streaming:
+        return data
+    key = (data.version, filters.key)
+    with _filtered_lock:
+        view = _filtered.get(key)
+        if view is not None:
+            _filtered.move_to_end(key)
+            return view
+
+    scope = data.index.select(filters)
+    df = data.df[data.index.mask(scope)]
+    derived = DerivedColumns(df)
+    view = DashboardData(type(data.cube)(df, derived=derived), data.version, df, derived, index=data.index,
+                         filters=filters, scope=scope)
+    with _filtered_lock:
+        _filtered[key] = view
+        while len(_filtered) > MAX_FILTERED_VIEWS:
+            _filtered.popitem(last=False)
+    return view
+
+
+# Figure builder of charts.py, looked up by name when the figure is drawn. charts.py pulls in
+# matplotlib and seaborn, so the dashboard imports it with the first figure it renders instead of
+# at startup. spec() builds the same chart as a Vega-Lite spec with vega_charts.py, or returns None
+# when the chart is only drawn by Matplotlib. References pickle by name.
+class Chart:
+    def __init__(self, name):
+        self.name = name
+
+    def __call__(self, *args):
+        return getattr(import_module('charts'), self.name)(*args)
+
+    def spec(self, *args):
+        build = getattr(import_module('vega_charts'), self.name, None)
+        return None if build is None else build(*args)
+
+    def __repr__(self):
+        return f'Chart({self.name!r})'
+
+
+# What a question shows: named numbers/text, named tables, and figures as id -> (draw, *args).
+# `filters` is the key of the filters it was computed under (None without filters).
+class QuestionResult:
+    def __init__(self, values=None, tables=None, figures=None):
+        self.values = values or {}
+        self.tables = tables or {}
+        self.figures = figures or {}
+        self.filters = None
+
+    def __getitem__(self, name):
+        if name in self.values:
+            return self.values[name]
+        return self.tables[name]
+
+
+def level1_q1(data):
+    cube = data.cube
+    # Calculate mean, median, and mode of Age
+    mean_age = cube.mean('Age')
+    median_age = cube.median('Age')
+    mode_age = cube.mode('Age')
+
+    # Data for visualization
+    statistics = ['Mean', 'Median', 'Mode']
+    values = [mean_age, median_age, mode_age]
+    return QuestionResult(values={'mean_age': mean_age, 'median_age': median_age, 'mode_age': mode_age},
+                          figures={'age_statistics': (Chart('plot_age_statistics'), statistics, values)})
+
+
+def level1_q2(data):
+    cube = data.cube
+    # Variance and Standard Deviation of Purchase Amount
+    variance_purchase = cube.var('Purchase Amount ($)')
+    std_purchase = cube.std('Purchase Amount ($)')
+
+    # Z-score of each purchase amount (computed once per dataset version). A density image is drawn
+    # from Z_SCORE_DENSITY_THRESHOLD rows on, and the z-score distribution when streaming since
+    # rows are not kept.
+    if data.streaming:
+        z_score_preview = cube.head[['Purchase Amount ($)']].copy()
+        z_score_preview['Z-score'] = (z_score_preview['Purchase Amount ($)'] - cube.mean(
+            'Purchase Amount ($)')) / std_purchase
+        figures = {'z_score_histogram': (Chart('plot_purchase_z_score_histogram'), *cube.purchase_z_histogram())}
+    else:
+        z_scores = data.derived['Z-score']
+        z_score_preview = data.derived.frame('Purchase Amount ($)', 'Z-score').head()
+        z_score_figure = 'z_scores_density' if len(data.df) >= Z_SCORE_DENSITY_THRESHOLD else 'z_scores'
+        figures = {z_score_figure: (Chart('plot_purchase_z_scores'), z_scores, Z_SCORE_DENSITY_THRESHOLD)}
+    return QuestionResult(values={'variance_purchase': variance_purchase, 'std_purchase': std_purchase},
+                          tables={'z_score_preview': z_score_preview}, figures=figures)
+
+
+def level1_q3(data):
+    cube = data.cube
+    top_categories = cube.value_counts('Product Category').head(3)
+
+    # Spread of purchase amounts within the top categories
+    purchase_percentiles = cube.quantile('Purchase Amount ($)', PERCENTILES, 'Product Category')
+    purchase_percentiles = purchase_percentiles.loc[top_categories.index].rename(columns=PERCENTILE_LABELS)
+    return QuestionResult(
+        values={'purchase_percentiles_error': cube.quantile_error('Purchase Amount ($)', 'Product Category')},
+        tables={'top_categories': top_categories, 'purchase_percentiles': purchase_percentiles},
+        figures={'top_categories': (Chart('plot_top_categories'), top_categories)})
+
+
+def level1_q4(data):
+    cube = data.cube
+    total_customers = cube.count('Return Customer').sum()
+
+    # Counting the number of return customers
+    return_customers = int(cube.sum('Return Customer'))
+
+    # Calculating the percentage of return customers
+    return_customer_percentage = (return_customers / total_customers) * 100
+
+    # Return customers per Product Category
+    return_counts = cube.sum('Return Customer', 'Product Category').astype(int)
+    return_customers_summary = return_counts[return_counts > 0].reset_index(name='Return Count')
+
+    total_purchases = cube.count('Product Category')
+
+    comparison_summary = pd.DataFrame({'Product Category': total_purchases.index,
+                                       'Total Purchases': total_purchases.to_numpy(),
+                                       'Return Count': return_counts.to_numpy()})
+    comparison_summary['Return Rate (%)'] = (comparison_summary['Return Count'] / comparison_summary[
+        'Total Purchases']) * 100
+    comparison_summary = comparison_summary.sort_values(by='Return Rate (%)', ascending=False)
+
+    # Age Range Analysis: return customers per Age Range and Gender cell
+    age_gender_return_summary = cube.sum('Return Customer', 'Age Range', 'Gender').astype(int).stack()
+    age_gender_return_summary = age_gender_return_summary[age_gender_return_summary > 0].reset_index(name='Count')
+    age_gender_return_summary = age_gender_return_summary.sort_values(by='Count', ascending=False)
+
+    return QuestionResult(
+        values={'return_customers': return_customers, 'return_customer_percentage': return_customer_percentage},
+        tables={'return_customers_summary': return_customers_summary, 'comparison_summary': comparison_summary,
+                'age_gender_return_summary': age_gender_return_summary},
+        figures={'return_rate_by_category': (Chart('plot_return_rate_by_category'), comparison_summary),
+                 'return_customers_by_age_gender': (Chart('plot_return_customers_by_age_gender'),
+                                                    age_gender_return_summary)})
+
+
+def level1_q5(data):
+    cube = data.cube
+    # Calculate the average review score
+    average_review_score = cube.mean('Review Score (1-5)')
+
+    # Group by Product Category and calculate average review score
+    average_review_by_product = cube.mean('Review Score (1-5)', 'Product Category').reset_index()
+    average_review_by_product.columns = ['Product Category', 'Average Review Score']
+
+    # Define threshold for low average review scores
+    low_average_review_threshold = 3
+    low_average_review_products = average_review_by_product[
+        average_review_by_product['Average Review Score'] <= low_average_review_threshold]
+
+    # Count total reviews by product category
+    reviews_count_by_product = cube.count('Product Category').reset_index(name='Total Reviews')
+
+    # Merge the two summaries for comparison
+    comparison_summary = pd.merge(reviews_count_by_product, average_review_by_product, on='Product Category',
+                                  how='left')
+    comparison_summary = comparison_summary.sort_values(by='Total Reviews', ascending=True)
+
+    return QuestionResult(
+        values={'average_review_score': average_review_score},
+        tables={'low_average_review_products': low_average_review_products,
+                'reviews_count_by_product': reviews_count_by_product, 'comparison_summary': comparison_summary},
+        figures={'review_distribution': (Chart('plot_review_distribution'), comparison_summary),
+                 'reviews_and_scores': (Chart('plot_reviews_and_scores_by_category'), comparison_summary)})
+
+
+def level1_q6(data):
+    # Calculate average delivery time based on subscription status
+    avg_delivery_time = data.cube.mean('Delivery Time (days)', 'Subscription Status')
+
+    # Reset the index for easier plotting
+    avg_delivery_time_df = avg_delivery_time.reset_index()
+    return QuestionResult(tables={'avg_delivery_time': avg_delivery_time_df},
+                          figures={'delivery_time': (Chart('plot_delivery_time_by_subscription'),
+                                                     avg_delivery_time_df)})
+
+
+def level1_q7(data):
+    cube = data.cube
+    subscribed_customers = cube.count('Subscription Status').sum()  # Count of non-null subscription statuses
+    unsubscribed_customers = cube.count() - subscribed_customers  # Total customers - subscribed customers
+    return QuestionResult(
+        values={'subscribed_customers': subscribed_customers, 'unsubscribed_customers': unsubscribed_customers},
+        figures={'subscription_distribution': (Chart('plot_subscription_distribution'), subscribed_customers,
+                                               unsubscribed_customers)})
+
+
+def level1_q8(data):
+    device_usage_percentage = data.cube.value_counts('Device Type', normalize=True) * 100
+    return QuestionResult(tables={'device_usage_percentage': device_usage_percentage},
+                          figures={'device_usage': (Chart('plot_device_usage'), device_usage_percentage)})
+
+
+def level1_q9(data):
+    avg_purchase_discount = data.cube.mean('Purchase Amount ($)', 'Discount Availed')
+    return QuestionResult(tables={'avg_purchase_discount': avg_purchase_discount},
+                          figures={'purchase_by_discount': (Chart('plot_purchase_by_discount'), avg_purchase_discount)})
+
+
+def level1_q10(data):
+    cube = data.cube
+    payment_method_counts = cube.value_counts('Payment Method')
+
+    # Find the most common payment method
+    most_common_payment_method = cube.mode('Payment Method')
+    return QuestionResult(values={'most_common_payment_method': most_common_payment_method},
+                          tables={'payment_method_counts': payment_method_counts},
+                          figures={'payment_method_distribution': (Chart('plot_payment_method_distribution'),
+                                                                   payment_method_counts)})
+
+
+def level2_q1(data):
+    cube = data.cube
+    avg_reviews_by_payment = cube.mean('Review Score (1-5)', 'Payment Method')
+    count_reviews_by_payment = cube.count('Payment Method')
+    most_common_payment_method = cube.mode('Payment Method')
+    average_review_score = avg_reviews_by_payment[most_common_payment_method]
+
+    # Age distribution of Bank Transfer users
+    age_group_counts = cube.count('Payment Method', 'Age Group').loc['Bank Transfer']
+
+    # Payment methods used by customers aged 10-19
+    payment_method_counts = cube.count('Age Group', 'Payment Method').loc['10-19']
+    payment_method_counts = payment_method_counts[payment_method_counts > 0].sort_values(ascending=False,
+                                                                                         kind='stable')
+
+    # Distribution of users by location
+    location_counts = cube.value_counts('Location')
+
+    # Payment method counts per location, for the pie charts
+    payment_methods_by_location = cube.count('Location', 'Payment Method')
+
+    # Locations of interest for pie charts
+    locations_of_interest = ['Dhaka', 'Sylhet', 'Barisal']
+
+    return QuestionResult(
+        values={'most_common_payment_method': most_common_payment_method,
+                'average_review_score': average_review_score},
+        tables={'age_group_counts': age_group_counts, 'payment_method_counts': payment_method_counts,
+                'location_counts': location_counts, 'payment_methods_by_location': payment_methods_by_location},
+        figures={'reviews_by_payment_method': (Chart('plot_reviews_by_payment_method'), avg_reviews_by_payment,
+                                               count_reviews_by_payment),
+                 'most_common_payment_review': (Chart('plot_most_common_payment_review'), most_common_payment_method,
+                                                average_review_score),
+                 'bank_transfer_age_groups': (Chart('plot_bank_transfer_age_groups'), age_group_counts),
+                 'teen_payment_methods': (Chart('plot_teen_payment_methods'), payment_method_counts),
+                 'users_by_location': (Chart('plot_users_by_location'), location_counts),
+                 'payment_methods_by_location': (Chart('plot_payment_methods_by_location'),
+                                                 payment_methods_by_location, locations_of_interest)})
+
+
+def level2_q2(data):
+    cube = data.cube
+    # Average purchase behaviour per 2-minute bin of time spent on the website
+    df_grouped = pd.DataFrame({
+        'Purchase Amount ($)': cube.mean('Purchase Amount ($)', 'Time Bins'),
+        'Number of Items Purchased': cube.mean('Number of Items Purchased', 'Time Bins')
+    }).reset_index()
+
+    # Calculate correlation between time spent and purchase amount/items directly
+    correlation_time_purchase = cube.corr('Time Spent on Website (min)', 'Purchase Amount ($)')
+    correlation_time_items = cube.corr('Time Spent on Website (min)', 'Number of Items Purchased')
+    return QuestionResult(
+        values={'correlation_time_purchase': correlation_time_purchase,
+                'correlation_time_items': correlation_time_items},
+        tables={'time_on_site': df_grouped},
+        figures={'time_on_site': (Chart('plot_time_on_site'), df_grouped)})
+
+
+def level2_q3(data):
+    if data.index is not None:
+        # Conjunctive counts straight from the bitmap index: return customers in scope, and those
+        # of them with a review score of 4 or 5
+        index = data.index
+        scope = index.all if data.scope is None else data.scope
+        return_customers = index.rows_with('Return Customer', [True]) & scope
+        satisfied_return_customers = index.count(return_customers, index.rows_between('Review Score (1-5)', 4, 5))
+        total_return_customers = index.count(return_customers)
+    else:
+        cube = data.cube
+        return_customers_by_review = cube.sum('Return Customer', 'Review Score (1-5)')
+        satisfied_return_customers = return_customers_by_review[return_customers_by_review.index >= 4].sum()
+
+        # Calculate the total number of return customers
+        total_return_customers = cube.sum('Return Customer')
+
+    # Calculate the percentage of satisfied return customers
+    if total_return_customers > 0:
+        percentage_satisfied_return_customers = (satisfied_return_customers / total_return_customers) * 100
+    else:
+        percentage_satisfied_return_customers = 0  # Avoid division by zero
+    return QuestionResult(values={'percentage_satisfied_return_customers': percentage_satisfied_return_customers})
+
+
+def level2_q4(data):
+    # Calculate average items purchased based on customer satisfaction
+    average_items_per_satisfaction = data.cube.mean('Number of Items Purchased', 'Customer Satisfaction')
+    return QuestionResult(tables={'average_items_per_satisfaction': average_items_per_satisfaction},
+                          figures={'items_by_satisfaction': (Chart('plot_items_by_satisfaction'),
+                                                             average_items_per_satisfaction)})
+
+
+def level2_q5(data):
+    average_purchase_by_location = data.cube.mean('Purchase Amount ($)', 'Location')
+
+    # Get the location with the second highest average purchase amount (None when the filters
+    # leave a single location)
+    sorted_average_purchase = average_purchase_by_location.sort_values(ascending=False)
+    if len(sorted_average_purchase) > 1:
+        second_highest_location = sorted_average_purchase.index[1]
+        second_highest_avg_purchase = sorted_average_purchase.iloc[1]
+    else:
+        second_highest_location, second_highest_avg_purchase = None, np.nan
+    return QuestionResult(
+        values={'second_highest_location': second_highest_location,
+                'second_highest_avg_purchase': second_highest_avg_purchase},
+        tables={'average_purchase_by_location': sorted_average_purchase},
+        figures={'purchase_by_location': (Chart('plot_purchase_by_location'), sorted_average_purchase,
+                                          second_highest_avg_purchase)})
+
+
+def level2_q6(data):
+    cube = data.cube
+    # Full Pearson matrix of the numeric columns, derived from the cube's correlation statistics
+    # without reading any rows, overall and per label of the correlation dimensions
+    correlations = cube.corr_matrix()
+    pairs = correlations.where(np.triu(np.ones(correlations.shape, dtype=bool), k=1)).stack().dropna()
+    strongest = pairs.abs().idxmax() if len(pairs) else None
+    tables = {'correlations': correlations}
+    figures = {'correlations': (Chart('plot_correlation_matrix'), correlations, 'All customers')}
+    for dim in CORRELATION_DIMENSIONS:
+        name = f"correlations_by_{dim.lower().replace(' ', '_')}"
+        tables[name] = cube.corr_matrix(dim)
+        figures[name] = (Chart('plot_correlation_matrices'), tables[name], dim)
+    return QuestionResult(values={'strongest_pair': strongest,
+                                  'strongest_correlation': pairs[strongest] if strongest else np.nan},
+                          tables=tables, figures=figures)
+
+
+def level3_q1(data):
+    cube = data.cube
+    # Rank every feature by its association with being a return customer. Everything comes from the
+    # group counts and moments of the cube, so the cost does not grow with the number of rows.
+    factors, rates = categorical_factors(cube)
+    effects = numeric_factors(cube)
+    return QuestionResult(values={'return_rate': cube.mean(TARGET) * 100, 'confidence': CONFIDENCE,
+                                  'significance': SIGNIFICANCE},
+                          tables={'factors': factors, 'numeric_effects': effects, 'return_rates': rates},
+                          figures={'return_factors': (Chart('plot_return_factors'), factors, SIGNIFICANCE),
+                                   'numeric_effects': (Chart('plot_numeric_effects'), effects, CONFIDENCE)})
+
+
+def level3_q2(data):
+    cube = data.cube
+    # Calculate return rate by payment method
+    return_rate_by_payment = cube.mean('Return Customer', 'Payment Method').reset_index()
+    return_rate_by_payment['Return Rate (%)'] = return_rate_by_payment['Return Customer'] * 100
+    return_rate_by_payment = return_rate_by_payment.sort_values(by='Return Rate (%)', ascending=False)
+
+    # Calculate satisfaction by payment method (example calculation)
+    satisfaction_by_payment = cube.mean('Review Score (1-5)', 'Payment Method').reset_index()
+
+    # Combine data
+    combined_data = pd.merge(satisfaction_by_payment, return_rate_by_payment, on='Payment Method')
+    return QuestionResult(tables={'satisfaction_and_return_rate': combined_data},
+                          figures={'satisfaction_and_return_rate': (Chart('plot_satisfaction_and_return_rate'),
+                                                                    combined_data)})
+
+
+def level3_q3(data):
+    cube = data.cube
+    location_data = pd.DataFrame({
+        'Purchase Amount ($)': cube.mean('Purchase Amount ($)', 'Location'),
+        'Delivery Time (days)': cube.mean('Delivery Time (days)', 'Location')
+    }).reset_index()
+
+    # Calculate correlation
+    correlation = location_data['Purchase Amount ($)'].corr(location_data['Delivery Time (days)'])
+
+    # Percentiles show whether a location differs across the distribution or only on average
+    tables = {'location_data': location_data}
+    values = {'correlation': correlation}
+    for name, measure in [('purchase', 'Purchase Amount ($)'), ('delivery', 'Delivery Time (days)')]:
+        tables[f'{name}_percentiles'] = cube.quantile(measure, PERCENTILES, 'Location').rename(
+            columns=PERCENTILE_LABELS)
+        values[f'{name}_percentiles_error'] = cube.quantile_error(measure, 'Location')
+    return QuestionResult(values=values, tables=tables,
+                          figures={'location_purchase_and_delivery': (Chart('plot_location_purchase_and_delivery'),
+                                                                      location_data)})
+
+
+def level3_q4(data):
+    gender_data = {
+        'Gender': ['Male', 'Female', 'Other'],
+        'Count': [450, 350, 100]
+    }
+
+    labels = gender_data['Gender']
+    sizes = gender_data['Count']
+    return QuestionResult(figures={'gender_distribution': (Chart('plot_gender_distribution'), labels, sizes)})
+
+
+# Charts of streamlit.py, computed like the questions from the data and the options the page
+# offers (hashable, they are part of the cache key)
+def reviews_by_payment_method(data):
+    cube = data.cube
+    avg_reviews_by_payment = cube.mean('Review Score (1-5)', 'Payment Method')
+    count_reviews_by_payment = cube.count('Payment Method')
+    return QuestionResult(figures={'reviews_by_payment_method': (Chart('plot_reviews_by_payment_method'),
+                                                                 avg_reviews_by_payment, count_reviews_by_payment)})
+
+
+def bank_transfer_users_by_location(data):
+    location_counts = data.cube.count('Location', 'Payment Method')['Bank Transfer']
+    location_counts = location_counts[location_counts > 0].sort_values(ascending=False, kind='stable')
+    return QuestionResult(tables={'location_counts': location_counts},
+                          figures={'bank_transfer_users_by_location': (Chart('plot_bank_transfer_users_by_location'),
+                                                                       location_counts)})
+
+
+def payment_method_distribution_by_location(data, locations_of_interest):
+    locations_of_interest = list(locations_of_interest)
+    payment_methods_by_location = data.cube.count('Location', 'Payment Method')
+    selected = payment_methods_by_location.loc[locations_of_interest]
+    return QuestionResult(tables={'payment_methods_by_location': selected},
+                          figures={'payment_methods_by_location': (Chart('plot_payment_methods_by_location'),
+                                                                   payment_methods_by_location, locations_of_interest)})
+
+
+# Compute function of every question, by question id
+COMPUTE = {question: globals()[question] for question, _, _ in QUESTIONS}
+
+# Compute function of every view of streamlit.py, by name
+VIEWS = {view: globals()[view] for view in ['reviews_by_payment_method', 'bank_transfer_users_by_location',
+                                            'payment_method_distribution_by_location']}
+
+
+_results = {}
+_results_lock = threading.Lock()
+
+
+# Seed the results of every question on all rows of a dataset version, computed elsewhere (e.g. by
+# the aggregate server); results of other versions are dropped
+def install_results(version, results):
+    with _results_lock:
+        for key in [k for k in _results if k[0] != version]:
+            del _results[key]
+        for question, result in results.items():
+            _results[(version, question, ())] = result
+
+
+# Drop the cached results of every dataset version, filtered views included
+def clear_results_cache():
+    with _filtered_lock:
+        views = list(_filtered.values())
+    with _results_lock:
+        _results.clear()
+        for view in views:
+            view.results.clear()
+
+
+# Result of a question, or of a view of streamlit.py given its options. Results are kept per
+# dataset version, filter state and options and shared by every session (treat them as read-only):
+# on all rows for as long as the version is current, on a filtered view for as long as the view is
+# kept. Streamed aggregates grow as rows are appended, so their results are computed each time.
+def compute_question(question, data, *args):
+    compute = COMPUTE.get(question) or VIEWS[question]
+    if data.streaming:
+        return compute(data, *args)
+    if data.filters:
+        results, key = data.results, (question, args)
+    else:
+        results, key = _results, (data.version, question, args)
+    with _results_lock:
+        result = results.get(key)
+    if result is not None:
+        return result
+    result = compute(data, *args)
+    if data.filters:
+        result.filters = data.filters.key
+    with _results_lock:
+        if not data.filters:
+            for stale in [k for k in _results if k[0] != data.version]:
+                del _results[stale]
+        results[key] = result
+    return result
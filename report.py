@@ -0,0 +1,133 @@
+import argparse
+import html
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+# Workers render off-screen
+matplotlib.use('Agg')
+
+from data_loader import DATASET_PATH
+from figure_cache import FIGURE_THEME, figure_cache, figure_key, render_figure
+from questions import QUESTIONS, compute_question, load_dashboard_data
+from streaming import STREAMING
+
+# Default directory of the static bundle
+REPORT_DIR = 'report'
+
+# Render one figure of a question to a PNG file in the bundle (runs in a worker process). The
+# parent computed the question with the same code the dashboard runs and sends the figure's
+# arguments, so workers never load the data. The figure cache is shared with the app, so figures it
+# has already rendered for this data version are reused.
+def render_report_figure(question, figure, draw, args, key, directory):
+    if key is not None:
+        image = figure_cache.get_or_render(key, draw, *args)
+    else:
+        image = render_figure(draw(*args))
+    filename = os.path.join('figures', f'{question}_{figure}.png')
+    with open(os.path.join(directory, filename), 'wb') as f:
+        f.write(image)
+    return filename
+
+
+def _label(name):
+    return name.replace('_', ' ').capitalize()
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return f'{value:,.4f}'
+    return str(value)
+
+
+# Write the tables of every question as CSV files; returns {question: [(name, filename, table)]}
+def write_tables(results, directory):
+    tables = {}
+    for question, result in results.items():
+        tables[question] = []
+        for name, table in result.tables.items():
+            filename = os.path.join('tables', f'{question}_{name}.csv')
+            table.to_csv(os.path.join(directory, filename))
+            tables[question].append((name, filename, table))
+    return tables
+
+
+# HTML index of the bundle: every question with its numbers, tables (linked to the CSV files)
+# and figures, grouped by level
+def write_index(results, tables, figures, directory, data_version, elapsed):
+    parts = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8">',
+             '<title>E-Commerce Data Analysis Report</title>',
+             '<style>body{font-family:sans-serif;margin:2em;color:#333}img{max-width:100%}'
+             'table{border-collapse:collapse;font-size:0.9em}td,th{border:1px solid #ccc;padding:2px 6px}</style>',
+             '</head><body>', '<h1>E-Commerce Data Analysis Report</h1>',
+             f'<p>Data version {html.escape(str(data_version))}, built in {elapsed:.1f} s.</p>']
+    current_level = None
+    for question, level, title in QUESTIONS:
+        if level != current_level:
+            parts.append(f'<h2>{html.escape(level)}</h2>')
+            current_level = level
+        parts.append(f'<h3 id="{question}">{html.escape(title)}</h3>')
+        result = results[question]
+        if result.values:
+            parts.append('<ul>')
+            for name, value in result.values.items():
+                parts.append(f'<li>{html.escape(_label(name))}: {html.escape(_format_value(value))}</li>')
+            parts.append('</ul>')
+        for name, filename, table in tables[question]:
+            parts.append(f'<h4>{html.escape(_label(name))} (<a href="{filename}">CSV</a>)</h4>')
+            parts.append(table.to_frame().to_html() if hasattr(table, 'to_frame') else table.to_html())
+        for figure in result.figures:
+            parts.append(f'<p><img src="{figures[(question, figure)]}" alt="{html.escape(_label(figure))}"></p>')
+    parts.append('</body></html>')
+    path = os.path.join(directory, 'index.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(parts))
+    return path
+
+
+# Build the static bundle of every dashboard question: index.html, figures/*.png and tables/*.csv.
+# Questions are computed once here (cheap aggregate lookups); figures, the expensive part, are
+# rendered from their arguments in a pool of worker processes, one per core by default.
+def build_report(directory=REPORT_DIR, path=DATASET_PATH, workers=None, streaming=STREAMING, use_cache=True):
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    for sub in ['figures', 'tables']:
+        os.makedirs(os.path.join(directory, sub), exist_ok=True)
+
+    data = load_dashboard_data(path, streaming)
+    results = {question: compute_question(question, data) for question, _, _ in QUESTIONS}
+    tables = write_tables(results, directory)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for question, result in results.items():
+            for figure, (draw, *args) in result.figures.items():
+                key = figure_key(question, figure, None, data.version, FIGURE_THEME) if use_cache else None
+                futures[(question, figure)] = pool.submit(render_report_figure, question, figure, draw, args, key,
+                                                          directory)
+        figures = {job: future.result() for job, future in futures.items()}
+
+    elapsed = time.perf_counter() - start
+    index = write_index(results, tables, figures, directory, data.version, elapsed)
+    return index, len(results), len(figures), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render every dashboard question to a static HTML bundle.')
+    parser.add_argument('--output', default=REPORT_DIR, help='directory of the bundle (default: %(default)s)')
+    parser.add_argument('--dataset', default=DATASET_PATH, help='CSV file to analyse')
+    parser.add_argument('--workers', type=int, default=None, help='render processes (default: one per core)')
+    parser.add_argument('--streaming', action='store_true', default=STREAMING,
+                        help='answer from a chunked scan instead of loading the whole dataset')
+    parser.add_argument('--no-cache', action='store_true', help='render every figure instead of using the cache')
+    args = parser.parse_args()
+
+    index, questions, figures, elapsed = build_report(args.output, args.dataset, args.workers, args.streaming,
+                                                      not args.no_cache)
+    print(f"Wrote {questions} questions and {figures} figures to {index} in {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
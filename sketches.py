@@ -0,0 +1,130 @@
+import numpy as np
+
+# Accuracy parameter of the quantile sketches (larger k: smaller error, more memory)
+SKETCH_K = 200
+
+# Up to this many values a sketch keeps them all and answers quantiles exactly
+EXACT_THRESHOLD = 50_000
+
+
+# Normalized rank error of a KLL sketch with parameter k at 99% confidence, using the empirical
+# fit published with the Apache DataSketches KLL implementation. A quantile answered by the
+# sketch is the exact quantile of some rank within +/- this fraction of n of the requested rank.
+def kll_rank_error(k=SKETCH_K):
+    return 2.296 / k ** 0.9723
+
+
+# KLL quantile sketch (Karnin, Lang, Liberty 2016). Values are kept in levels of compactors where
+# an item on level h stands for 2**h input values; when a level outgrows its capacity it is sorted
+# and every other item is promoted. Memory stays O(k log(n/k)). Sketches of different chunks or
+# groups merge into a sketch of their union. Until more than exact_threshold values were added no
+# compaction happens at all and quantiles are exact.
+class QuantileSketch:
+    def __init__(self, k=SKETCH_K, exact_threshold=EXACT_THRESHOLD, seed=0):
+        self.k = k
+        self.exact_threshold = exact_threshold
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self.compacted = False
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def exact(self):
+        return not self.compacted
+
+    # Normalized rank error bound of the answers (0 while the sketch is exact)
+    @property
+    def rank_error(self):
+        return 0.0 if self.exact else kll_rank_error(self.k)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    # Fold another sketch into this one
+    def merge(self, other):
+        self.n += other.n
+        self.compacted = self.compacted or other.compacted
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self._compress()
+        return self
+
+    # New sketch of both inputs, leaving this one untouched
+    def merged(self, other):
+        result = self.copy()
+        return result.merge(other)
+
+    def copy(self):
+        result = QuantileSketch(self.k, self.exact_threshold)
+        result.n = self.n
+        result.levels = [items.copy() for items in self.levels]
+        result.compacted = self.compacted
+        result._rng = np.random.default_rng(self._rng.integers(2 ** 32))
+        return result
+
+    def _capacity(self, h):
+        depth = len(self.levels) - 1 - h
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        if not self.compacted and self.n <= self.exact_threshold:
+            return
+        self.compacted = True
+        # As in the published KLL, levels are only compacted while the sketch as a whole holds more
+        # items than its total capacity, lowest full level first; compacting every full level at
+        # once would keep a fraction of the items and miss the error bound
+        while sum(len(items) for items in self.levels) > sum(self._capacity(h) for h in range(len(self.levels))):
+            # Capacities depend on the number of levels, so look again from the bottom each time
+            h = next(h for h, items in enumerate(self.levels) if len(items) > self._capacity(h))
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[h])
+            # An odd item out stays on this level so the total weight is preserved
+            keep = items[:len(items) % 2]
+            promoted = items[len(keep):][int(self._rng.integers(2))::2]
+            self.levels[h] = keep
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+
+    # Quantile(s) of the sketched values, q in [0, 1]
+    def quantile(self, q):
+        scalar = np.ndim(q) == 0
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        if self.n == 0:
+            result = np.full(len(q), np.nan)
+        elif self.exact:
+            # Same interpolation as pandas/numpy, so small data matches Series.quantile()
+            result = np.quantile(self.levels[0], q)
+        else:
+            values = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+            order = np.argsort(values, kind='stable')
+            values, cumulative = values[order], np.cumsum(weights[order])
+            ranks = q * cumulative[-1]
+            result = values[np.minimum(np.searchsorted(cumulative, ranks, side='left'), len(values) - 1)]
+        return float(result[0]) if scalar else result
+
+    def median(self):
+        return self.quantile(0.5)
+
+
+# Build one sketch per label of a coded dimension in a single sort over the codes
+def group_sketches(values, codes, labels, k=SKETCH_K, exact_threshold=EXACT_THRESHOLD):
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    boundaries = np.searchsorted(sorted_codes, np.arange(len(labels) + 1))
+    sketches = {}
+    for i, label in enumerate(labels):
+        start, end = boundaries[i], boundaries[i + 1]
+        if end > start:
+            sketches[label] = QuantileSketch(k, exact_threshold).update(values[order[start:end]])
+    return sketches
@@ -0,0 +1,183 @@
+import argparse
+import glob
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+import pandas as pd
+
+from aggregates import install_cube, load_cube
+from bitmaps import install_bitmap_index, load_bitmap_index
+from column_store import STORE_DIR, read_store
+from data_loader import DATASET_PATH, dataset_loaded, get_dataset, install_version
+from derived import DERIVED_COLUMNS, install_derived, load_derived
+
+# Startup snapshots are kept here; build them ahead of time (e.g. when building the server image)
+# with `python snapshot.py`
+SNAPSHOT_DIR = os.environ.get('STATICA_SNAPSHOT_DIR',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshot"))
+
+# Bump when the pickled layout changes; snapshots of another format are ignored
+SNAPSHOT_FORMAT = 8
+
+_restore_lock = threading.Lock()
+
+
+# Snapshot file of a dataset path
+def snapshot_path(path=DATASET_PATH, directory=SNAPSHOT_DIR):
+    path = os.path.abspath(path)
+    digest = hashlib.blake2b(path.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(directory, f"{os.path.basename(path)}.{digest}.pkl")
+
+
+# Pickler leaving the rows out when the column store holds them (see _SnapshotUnpickler)
+class _SnapshotPickler(pickle.Pickler):
+    def __init__(self, f, rows=None):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.rows = rows
+
+    def persistent_id(self, obj):
+        return 'rows' if self.rows is not None and obj is self.rows else None
+
+
+# Unpickler mapping the rows a snapshot left out from the column store, once for every reference
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, f, path, store_directory):
+        super().__init__(f)
+        self.path = path
+        self.store_directory = store_directory
+        self.stored = None
+
+    def persistent_load(self, pid):
+        if pid != 'rows':
+            raise pickle.UnpicklingError(f"Unknown reference {pid!r}")
+        if self.stored is None:
+            self.stored = read_store(self.path, self.store_directory)
+            if self.stored is None:
+                raise pickle.UnpicklingError("The column store of the snapshot is missing")
+        return self.stored[1]
+
+
+# Pickle the parsed frame, every derived column, the aggregate cube and the bitmap index of the
+# current version of a dataset, so a new server process can start without parsing the CSV. When
+# the column store holds the same version, the snapshot refers to its rows instead of copying
+# them, and every process maps the one copy. Returns the snapshot file.
+def write_snapshot(path=DATASET_PATH, directory=SNAPSHOT_DIR, store_directory=STORE_DIR):
+    entry = get_dataset(path)
+    derived = load_derived(path)
+    for name in DERIVED_COLUMNS:
+        derived[name]
+    stored = read_store(path, store_directory, entry.fingerprint) is not None
+    snapshot = {'format': SNAPSHOT_FORMAT, 'pandas': pd.__version__, 'path': entry.path,
+                'fingerprint': entry.fingerprint, 'offset': entry.mark.offset, 'stat': entry.stat,
+                'probe': entry.mark.probe, 'stored': stored, 'df': entry.df,
+                'derived': derived, 'cube': load_cube(path), 'index': load_bitmap_index(path)}
+
+    os.makedirs(directory, exist_ok=True)
+    target = snapshot_path(path, directory)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        _SnapshotPickler(f, entry.df if stored else None).dump(snapshot)
+    os.replace(tmp_path, target)
+    return target
+
+
+def read_snapshot(path=DATASET_PATH, directory=SNAPSHOT_DIR, store_directory=STORE_DIR):
+    try:
+        with open(snapshot_path(path, directory), 'rb') as f:
+            unpickler = _SnapshotUnpickler(f, path, store_directory)
+            snapshot = unpickler.load()
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if snapshot.get('format') != SNAPSHOT_FORMAT or snapshot.get('pandas') != pd.__version__:
+        return None
+    if snapshot['stored'] and unpickler.stored[0]['fingerprint'] != snapshot['fingerprint']:
+        return None
+    return snapshot
+
+
+# Digest of this package's source. Question results depend on the code that computed them as much
+# as on the data, so saved results are only reused by the same code.
+def code_version():
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(name, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+# Results file of a dataset path, next to its snapshot
+def results_path(path=DATASET_PATH, directory=SNAPSHOT_DIR):
+    return snapshot_path(path, directory)[:-len('.pkl')] + '.results.pkl'
+
+
+# Save the results of every question on all rows of one version of a dataset (see warmup.py), so a
+# restarted process loads them instead of computing them again. Returns the results file.
+def write_results(version, results, path=DATASET_PATH, directory=SNAPSHOT_DIR):
+    saved = {'format': SNAPSHOT_FORMAT, 'pandas': pd.__version__, 'code': code_version(), 'version': version,
+             'results': results}
+    os.makedirs(directory, exist_ok=True)
+    target = results_path(path, directory)
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, target)
+    return target
+
+
+# Saved results of a dataset version, or None unless they were saved by this code for that version
+def read_results(version, path=DATASET_PATH, directory=SNAPSHOT_DIR):
+    try:
+        with open(results_path(path, directory), 'rb') as f:
+            saved = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if (saved.get('format'), saved.get('pandas'), saved.get('code'), saved.get('version')) != (
+            SNAPSHOT_FORMAT, pd.__version__, code_version(), version):
+        return None
+    return saved['results']
+
+
+# Seed the process caches (parsed frame, derived columns, cube, bitmap index) from the snapshot of a dataset,
+# unless the dataset is already loaded. Unless the file is unchanged since the snapshot was taken
+# it is hashed up to the snapshot's offset, and a snapshot of other content is ignored (see
+# install_version). Rows appended after the snapshot
+# was taken are parsed on the next load and merged into the snapshot's cube, like any other append.
+# Returns whether the snapshot was used.
+def restore_snapshot(path=DATASET_PATH, directory=SNAPSHOT_DIR, store_directory=STORE_DIR):
+    if dataset_loaded(path):
+        return False
+    with _restore_lock:
+        if dataset_loaded(path):
+            return False
+        snapshot = read_snapshot(path, directory, store_directory)
+        if snapshot is None:
+            return False
+        entry = install_version(path, snapshot['offset'], snapshot['fingerprint'], snapshot['df'],
+                                stat=snapshot['stat'], probe=snapshot['probe'])
+        if entry is None:
+            return False
+        install_derived(entry, snapshot['derived'])
+        install_cube(entry, snapshot['cube'])
+        install_bitmap_index(entry, snapshot['index'])
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute the startup snapshot of a dataset (parsed rows, '
+                                                 'derived columns, aggregates and bitmap index).')
+    parser.add_argument('--dataset', default=DATASET_PATH, help='CSV file to snapshot')
+    parser.add_argument('--output', default=SNAPSHOT_DIR, help='snapshot directory (default: %(default)s)')
+    parser.add_argument('--store', default=STORE_DIR, help='column store whose rows the snapshot may refer to '
+                                                           '(default: %(default)s)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    target = write_snapshot(args.dataset, args.output, args.store)
+    print(f"Wrote {target} ({os.path.getsize(target) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
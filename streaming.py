@@ -0,0 +1,325 @@
+import copy
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from aggregates import (CORRELATION_DIMENSIONS, DIMENSIONS, MEASURES, PAIRS, QUANTILE_DIMENSIONS, QUANTILE_MEASURES,
+                        Aggregates, build_correlations, build_sketches, dimension_values, encode_dimension,
+                        merge_correlations, merge_sketches)
+from data_loader import DATASET_PATH, appended_range, file_stat, ingest_mark, read_csv_range
+from derived import DERIVED_COLUMNS
+
+# Set STATICA_STREAMING=1 to answer the dashboard questions from a chunked scan of the CSV
+# instead of holding the whole dataset in one DataFrame
+STREAMING = os.environ.get('STATICA_STREAMING') == '1'
+
+# Rows parsed per chunk
+CHUNK_SIZE = 100_000
+
+# Width of the Purchase Amount ($) histogram bins behind the streamed z-score distribution
+PURCHASE_BIN_WIDTH = 1.0
+
+# Leading rows kept for previews
+HEAD_ROWS = 5
+
+
+# Merge two (n, mean, m2) moment triples elementwise (Chan et al. parallel Welford update)
+def combine_moments(a, b):
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.where(n > 0, n_b / n, 0.0)
+    delta = mean_b - mean_a
+    return n, mean_a + delta * ratio, m2_a + m2_b + delta * delta * n_a * ratio
+
+
+# (n, mean, m2) of every column of a 2-D array, ignoring NaN
+def column_moments(values):
+    valid = ~np.isnan(values)
+    n = valid.sum(axis=0).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(n > 0, np.where(valid, values, 0.0).sum(axis=0) / n, 0.0)
+    deviations = np.where(valid, values - mean, 0.0)
+    return n, mean, (deviations * deviations).sum(axis=0)
+
+
+# Mergeable per-chunk state for every dashboard question: row counts, Welford moments of every
+# measure (overall and per dimension/pair), the value frequencies behind mode/top-k, quantile
+# sketches, correlation statistics and a Purchase Amount histogram. Memory depends on the number
+# of groups, never on the number of rows, and states of separate chunks combine with merge().
+class StreamingAggregates(Aggregates):
+    def __init__(self, dimensions=DIMENSIONS, measures=MEASURES, pairs=PAIRS):
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        self.keys = [(dim,) for dim in self.dimensions] + [tuple(pair) for pair in pairs]
+        self._measure_index = {m: i for i, m in enumerate(self.measures)}
+        width = len(self.measures)
+
+        self.rows = 0
+        self.totals = (np.zeros(width), np.zeros(width), np.zeros(width))
+        # key -> {label tuple: [count, n, mean, m2]}
+        self.groups = {key: {} for key in self.keys}
+        self.categories = {}
+        self.purchase_histogram = {}
+        self.sketches = None
+        self.correlations = None
+        self.head = None
+        # Version and byte offset of the file content folded in so far
+        self.fingerprint = None
+        self.offset = 0
+
+    # Fold one chunk of rows into the state
+    def update(self, chunk):
+        if len(chunk) == 0:
+            return self
+        if self.head is None:
+            self.head = chunk.head(HEAD_ROWS).reset_index(drop=True)
+
+        values = np.column_stack([chunk[m].to_numpy(dtype=np.float64) for m in self.measures])
+        self.rows += len(chunk)
+        self.totals = combine_moments(self.totals, column_moments(values))
+
+        purchase = chunk['Purchase Amount ($)'].to_numpy(dtype=np.float64)
+        purchase = purchase[~np.isnan(purchase)]
+        bins, counts = np.unique(np.floor(purchase / PURCHASE_BIN_WIDTH).astype(np.int64), return_counts=True)
+        for b, c in zip(bins.tolist(), counts.tolist()):
+            self.purchase_histogram[b] = self.purchase_histogram.get(b, 0) + c
+
+        columns = {}
+        for dim in self.dimensions:
+            column = dimension_values(chunk, dim)
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                self._add_categories(dim, column.cat.categories)
+            columns[dim] = column
+        codes, labels = {}, {}
+        for dim in set(QUANTILE_DIMENSIONS) | set(CORRELATION_DIMENSIONS):
+            codes[dim], labels[dim] = encode_dimension(columns[dim])
+        sketches = build_sketches({m: chunk[m].to_numpy(dtype=np.float64) for m in QUANTILE_MEASURES}, codes, labels)
+        self.sketches = sketches if self.sketches is None else merge_sketches(self.sketches, sketches)
+        correlations = build_correlations(values, codes, labels, self.measures)
+        self.correlations = (correlations if self.correlations is None
+                             else merge_correlations(self.correlations, correlations))
+
+        frame = pd.DataFrame(columns)
+        for m in self.measures:
+            frame[f'measure: {m}'] = chunk[m].to_numpy(dtype=np.float64)
+        measure_columns = [f'measure: {m}' for m in self.measures]
+
+        for key in self.keys:
+            grouped = frame.groupby(list(key), observed=True, sort=False)
+            count = grouped.size()
+            n = grouped[measure_columns].count().to_numpy(dtype=np.float64)
+            mean = grouped[measure_columns].mean().fillna(0.0).to_numpy()
+            m2 = (grouped[measure_columns].var(ddof=0).fillna(0.0) * n).to_numpy()
+            table = self.groups[key]
+            for i, label in enumerate(count.index):
+                self._merge_group(table, label if isinstance(label, tuple) else (label,),
+                                  [int(count.iloc[i]), n[i], mean[i], m2[i]])
+        return self
+
+    # Combine another state (e.g. of a later chunk or another worker) into this one
+    def merge(self, other):
+        if self.head is None:
+            self.head = other.head
+        self.rows += other.rows
+        self.totals = combine_moments(self.totals, other.totals)
+        for b, c in other.purchase_histogram.items():
+            self.purchase_histogram[b] = self.purchase_histogram.get(b, 0) + c
+        if other.sketches is not None:
+            self.sketches = other.sketches if self.sketches is None else merge_sketches(self.sketches, other.sketches)
+        if other.correlations is not None:
+            self.correlations = (other.correlations if self.correlations is None
+                                 else merge_correlations(self.correlations, other.correlations))
+        for dim, categories in other.categories.items():
+            self._add_categories(dim, categories)
+        for key, table in other.groups.items():
+            for label, record in table.items():
+                self._merge_group(self.groups[key], label, record)
+        return self
+
+    # Category order of a categorical dimension: the bins of binned dimensions, or the union of the
+    # (sorted) category sets of the chunks seen so far
+    def _add_categories(self, dim, categories):
+        current = self.categories.get(dim)
+        if current is None:
+            self.categories[dim] = list(categories)
+            return
+        new = [category for category in categories if category not in current]
+        if new:
+            combined = current + new
+            self.categories[dim] = combined if dim in DERIVED_COLUMNS else sorted(combined)
+
+    @staticmethod
+    def _merge_group(table, label, record):
+        current = table.get(label)
+        if current is None:
+            table[label] = [record[0], record[1].copy(), record[2].copy(), record[3].copy()]
+            return
+        n, mean, m2 = combine_moments((current[1], current[2], current[3]), (record[1], record[2], record[3]))
+        table[label] = [current[0] + record[0], n, mean, m2]
+
+    def _labels(self, dim):
+        if dim in self.categories:
+            return list(self.categories[dim])
+        labels = set()
+        for key, table in self.groups.items():
+            if dim in key:
+                position = key.index(dim)
+                labels.update(label[position] for label in table)
+        return sorted(labels)
+
+    def _table(self, dims):
+        dims = tuple(dims)
+        if dims in self.groups:
+            return self.groups[dims], False
+        if dims[::-1] in self.groups:
+            return self.groups[dims[::-1]], True
+        raise KeyError(f"No aggregates for {dims}")
+
+    # Build a Series/DataFrame of value(record) per group, like AggregateCube does
+    def _frame(self, dims, value, name=None, fill=np.nan):
+        table, transposed = self._table(dims)
+        if len(dims) == 1:
+            labels = [label for label in self._labels(dims[0]) if (label,) in table]
+            return pd.Series([value(table[(label,)]) for label in labels], index=pd.Index(labels, name=dims[0]),
+                             name=name)
+        rows, columns = self._labels(dims[0]), self._labels(dims[1])
+        data = np.full((len(rows), len(columns)), fill, dtype=np.float64)
+        for i, row in enumerate(rows):
+            for j, column in enumerate(columns):
+                record = table.get((column, row) if transposed else (row, column))
+                if record is not None:
+                    data[i, j] = value(record)
+        return pd.DataFrame(data, index=pd.Index(rows, name=dims[0]), columns=pd.Index(columns, name=dims[1]))
+
+    def count(self, *dims):
+        if not dims:
+            return self.rows
+        result = self._frame(dims, lambda record: record[0], name='count', fill=0)
+        return result.astype(np.int64)
+
+    def sum(self, measure, *dims):
+        i = self._measure_index[measure]
+        if not dims:
+            return self.totals[0][i] * self.totals[1][i]
+        return self._frame(dims, lambda record: record[1][i] * record[2][i], name=measure, fill=0.0)
+
+    def mean(self, measure, *dims):
+        i = self._measure_index[measure]
+        if not dims:
+            return self.totals[1][i] if self.totals[0][i] else np.nan
+        return self._frame(dims, lambda record: record[2][i] if record[1][i] else np.nan, name=measure)
+
+    def var(self, measure, *dims):
+        i = self._measure_index[measure]
+        if not dims:
+            n = self.totals[0][i]
+            return self.totals[2][i] / (n - 1) if n > 1 else np.nan
+        return self._frame(dims, lambda record: record[3][i] / (record[1][i] - 1) if record[1][i] > 1 else np.nan,
+                           name=measure)
+
+    # Z-score distribution of Purchase Amount ($): (bin centers in z units, row counts)
+    def purchase_z_histogram(self):
+        bins = np.array(sorted(self.purchase_histogram), dtype=np.int64)
+        counts = np.array([self.purchase_histogram[b] for b in bins.tolist()], dtype=np.int64)
+        centers = (bins + 0.5) * PURCHASE_BIN_WIDTH
+        mean, std = self.mean('Purchase Amount ($)'), self.std('Purchase Amount ($)')
+        return (centers - mean) / std, counts
+
+
+def _header(path):
+    with open(path, 'rb') as f:
+        line = f.readline()
+        return pd.read_csv(io.BytesIO(line), nrows=0).columns.tolist(), f.tell()
+
+
+# Split the data rows of a CSV (up to byte `end`) into about `parts` byte ranges that start and
+# end on line boundaries
+def split_byte_ranges(path, parts, end=None):
+    _, start = _header(path)
+    size = os.path.getsize(path) if end is None else end
+    boundaries = [start]
+    with open(path, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(max(start + (size - start) * i // parts, boundaries[-1]))
+            f.readline()
+            boundaries.append(min(f.tell(), size))
+    boundaries.append(size)
+    return [(a, b) for a, b in zip(boundaries, boundaries[1:]) if b > a]
+
+
+# Fold the rows between two byte offsets of a CSV into a fresh state
+def scan_range(path, start, end, names, chunksize=CHUNK_SIZE):
+    state = StreamingAggregates()
+    for chunk in read_csv_range(path, start, end, names=names, chunksize=chunksize):
+        state.update(chunk)
+    return state
+
+
+# Scan a CSV chunk by chunk with bounded memory. With workers > 1 the file is split into byte
+# ranges that are scanned in parallel processes and their states merged in file order.
+def scan_csv(path=DATASET_PATH, chunksize=CHUNK_SIZE, workers=1, end=None):
+    names, start = _header(path)
+    end = os.path.getsize(path) if end is None else end
+    ranges = split_byte_ranges(path, max(1, workers), end)
+    if workers <= 1 or len(ranges) <= 1:
+        states = [scan_range(path, start, end, names, chunksize)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            states = list(pool.map(scan_range, [path] * len(ranges), [a for a, _ in ranges],
+                                   [b for _, b in ranges], [names] * len(ranges), [chunksize] * len(ranges)))
+    state = states[0]
+    for other in states[1:]:
+        state.merge(other)
+    return state
+
+
+_streamed = {}
+_streamed_lock = threading.Lock()
+
+
+# Streamed aggregates for the current version of a CSV. When the file only grew, just the appended
+# lines are scanned and merged into a copy of the previous state; other changes trigger a rescan.
+def load_streaming_aggregates(path=DATASET_PATH, workers=1):
+    path = os.path.abspath(path)
+    stat = file_stat(path)
+    with _streamed_lock:
+        cached = _streamed.get(path)
+        if cached is not None and cached[0] == stat:
+            return cached[2]
+
+        if cached is not None:
+            appended = appended_range(path, cached[1])
+            if appended is not None and appended[1] > appended[0]:
+                start, end = appended
+                state = copy.deepcopy(cached[2]).merge(scan_range(path, start, end, _header(path)[0]))
+                mark = cached[1].extend(path, end)
+                state.fingerprint = mark.fingerprint
+                state.offset = mark.offset
+                _streamed[path] = (stat, mark, state)
+                return state
+
+        mark = ingest_mark(path)
+        if cached is not None and cached[2].fingerprint == mark.fingerprint:
+            _streamed[path] = (stat, cached[1], cached[2])
+            return cached[2]
+
+        state = scan_csv(path, workers=workers, end=mark.offset)
+        state.fingerprint = mark.fingerprint
+        state.offset = mark.offset
+        _streamed[path] = (stat, mark, state)
+        return state
+
+
+# Drop cached streamed aggregates (all of them, or only the one for the given path)
+def clear_streaming_cache(path=None):
+    with _streamed_lock:
+        if path is None:
+            _streamed.clear()
+        else:
+            _streamed.pop(os.path.abspath(path), None)
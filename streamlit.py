@@ -1,66 +1,55 @@
-import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-
-
-# Load data
-df = pd.read_csv("ecommerce_customer_behavior_dataset.csv")
-
-
-# Function to plot average review scores and count of reviews by payment method
-def plot_reviews_by_payment_method(df):
-    avg_reviews_by_payment = df.groupby('Payment Method')['Review Score (1-5)'].mean()
-    count_reviews_by_payment = df.groupby('Payment Method')['Review Score (1-5)'].count()
-
-    fig, ax1 = plt.subplots(figsize=(10, 6))
-
-    color = 'tab:blue'
-    ax1.set_xlabel('Payment Method')
-    ax1.set_ylabel('Average Review Score (1-5)', color=color)
-    avg_reviews_by_payment.plot(kind='bar', color=color, ax=ax1, position=1, width=0.4)
-    ax1.tick_params(axis='y', labelcolor=color)
-    ax1.set_ylim(0, 5)
-
-    ax2 = ax1.twinx()
-    color = 'tab:orange'
-    ax2.set_ylabel('Count of Reviews', color=color)
-    count_reviews_by_payment.plot(kind='bar', color=color, ax=ax2, position=0, width=0.4)
-    ax2.tick_params(axis='y', labelcolor=color)
-
-    plt.title('Average Review Scores and Count of Reviews by Payment Method')
-    plt.xticks(rotation=45)
-    st.pyplot(fig)
+import time
 
+import streamlit as st
 
-# Function to plot bank transfer users by location
-def plot_bank_transfer_users_by_location(df):
-    bank_transfer_users = df[df['Payment Method'] == 'Bank Transfer']
-    location_counts = bank_transfer_users['Location'].value_counts()
-
-    plt.figure(figsize=(10, 6))
-    location_counts.plot(kind='bar', color='lightgreen')
-    plt.title('Number of Bank Transfer Users by Location')
-    plt.xlabel('Location')
-    plt.ylabel('Number of Users')
-    plt.xticks(rotation=45)
-    st.pyplot(plt)
-
-
-# Function to plot payment method distribution by locations of interest
-def plot_payment_method_distribution_by_location(df, locations_of_interest):
-    fig, axes = plt.subplots(1, len(locations_of_interest), figsize=(18, 6))
-
-    for ax, location in zip(axes, locations_of_interest):
-        filtered_users = df[df['Location'] == location]
-        payment_method_counts = filtered_users['Payment Method'].value_counts()
-
-        ax.pie(payment_method_counts, labels=payment_method_counts.index, autopct='%1.1f%%', startangle=90,
-               colors=['#ff9999', '#66b3ff', '#99ff99', '#ffcc99'])
-        ax.set_title(f'Payment Methods Used in {location}')
-        ax.axis('equal')
-
-    plt.tight_layout()
-    st.pyplot(fig)
+from aggregate_server import attach_aggregates
+from aggregates import load_cube
+from column_store import restore_store
+from data_loader import dataset_version
+from figure_cache import FIGURE_THEME, figure_cache, figure_key
+from metrics import ADMIN, METRICS_DIR, metrics
+from questions import DashboardData, compute_question
+from snapshot import restore_snapshot
+from vega_charts import RENDERER
+
+
+# Load data: aggregates over the shared dataset, built once per file version (or attached from the
+# aggregate server, or the startup snapshot or the column store when they match it)
+load_start = time.perf_counter()
+attach_aggregates() or restore_snapshot() or restore_store()
+data = DashboardData(load_cube(), dataset_version())
+load_seconds = time.perf_counter() - load_start
+
+
+# Show the charts of a view of this page (see VIEWS in questions.py) for the options picked in the
+# sidebar. Results are cached per dataset version and options by compute_question. A chart is sent
+# as a Vega-Lite spec for the browser to draw (see vega_charts.py), or else rendered on the server
+# through the figure cache, keyed by the options instead of a filter state; either way the figure
+# is released once rendered, so none accumulate across reruns.
+def show_view(trace, view, *options):
+    with trace.span('compute'):
+        result = compute_question(view, data, *options)
+    for figure, (chart, *args) in result.figures.items():
+        with trace.span('render', figure):
+            spec = chart.spec(*args) if RENDERER == 'vega' else None
+            if spec is None:
+                key = figure_key(view, figure, list(options) or None, data.version, FIGURE_THEME)
+                image = figure_cache.get_or_render(key, chart, *args)
+        with trace.span('transfer', figure):
+            if spec is None:
+                st.image(image, width='stretch')
+            else:
+                st.vega_lite_chart(spec, width='stretch')
+
+
+# Timing panel for operators (STATICA_ADMIN=1), shared with the main dashboard's metrics
+def show_admin_panel():
+    with st.sidebar.expander('Timing (admin)'):
+        summary = metrics.summary()
+        st.dataframe(summary[summary['figure'].isna()].drop(columns='figure'), hide_index=True)
+        st.download_button('Download JSON', metrics.to_json(), file_name='metrics.json', mime='application/json')
+        st.download_button('Download Prometheus', metrics.to_prometheus(), file_name='metrics.prom',
+                           mime='text/plain')
 
 
 # Streamlit Layout
@@ -72,21 +61,34 @@ def main():
     level1 = st.sidebar.selectbox('Choose Visualization Level',
                                   ['Level 1: Payment Method Reviews', 'Level 2: Location-Specific Data'])
 
+    trace = None
+
     # Level 1: Select the option
     if level1 == 'Level 1: Payment Method Reviews':
         level1_option = st.sidebar.selectbox('Choose Level 1 Visualization',
                                              ['Review Scores by Payment Method', 'Bank Transfer Users by Location'])
         if level1_option == 'Review Scores by Payment Method':
-            plot_reviews_by_payment_method(df)
+            trace = metrics.trace('reviews_by_payment_method')
+            show_view(trace, 'reviews_by_payment_method')
         elif level1_option == 'Bank Transfer Users by Location':
-            plot_bank_transfer_users_by_location(df)
+            trace = metrics.trace('bank_transfer_users_by_location')
+            show_view(trace, 'bank_transfer_users_by_location')
 
     # Level 2: Location-Specific Data
     elif level1 == 'Level 2: Location-Specific Data':
         locations_of_interest = st.sidebar.multiselect('Select Locations of Interest',
                                                        ['Dhaka', 'Sylhet', 'Barisal'])
         if locations_of_interest:
-            plot_payment_method_distribution_by_location(df, locations_of_interest)
+            trace = metrics.trace('payment_method_distribution_by_location')
+            show_view(trace, 'payment_method_distribution_by_location', tuple(locations_of_interest))
+
+    if trace is not None:
+        trace.add('load', load_seconds)
+        trace.finish()
+    if METRICS_DIR:
+        metrics.write(METRICS_DIR)
+    if ADMIN:
+        show_admin_panel()
 
 
 if __name__ == "__main__":
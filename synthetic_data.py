@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATASET_PATH
+
+# Columns with at most this many distinct values are sampled from their observed frequencies
+MAX_CATEGORICAL_VALUES = 100
+
+# Rows generated and written per block, so large files never sit in memory at once
+WRITE_CHUNK_ROWS = 500_000
+
+
+# How to sample every column of a reference dataset, by column name:
+#   ('sequence', first)                running integer ids
+#   ('choice', values, probabilities)  observed values with their observed frequencies
+#   ('uniform', low, high, decimals)   continuous values in the observed range
+def dataset_profile(path=DATASET_PATH):
+    df = pd.read_csv(path)
+    profile = {}
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_integer_dtype(values) and values.is_unique and values.is_monotonic_increasing:
+            profile[column] = ('sequence', int(values.iloc[0]))
+        elif values.nunique() <= MAX_CATEGORICAL_VALUES:
+            frequencies = values.value_counts(normalize=True, sort=False)
+            profile[column] = ('choice', frequencies.index.to_numpy(), frequencies.to_numpy())
+        else:
+            decimals = int(values.map(lambda v: len(f'{v}'.split('.')[1]) if '.' in f'{v}' else 0).max())
+            profile[column] = ('uniform', float(values.min()), float(values.max()), decimals)
+    return profile
+
+
+# Frame of `rows` synthetic rows following a profile; `offset` continues the id sequences
+def generate_frame(profile, rows, rng, offset=0):
+    columns = {}
+    for column, spec in profile.items():
+        kind = spec[0]
+        if kind == 'sequence':
+            columns[column] = np.arange(spec[1] + offset, spec[1] + offset + rows)
+        elif kind == 'choice':
+            columns[column] = spec[1][rng.choice(len(spec[1]), size=rows, p=spec[2])]
+        else:
+            columns[column] = np.round(rng.uniform(spec[1], spec[2], size=rows), spec[3])
+    return pd.DataFrame(columns)
+
+
+# Write a synthetic CSV with the schema and value distributions of the reference dataset
+def write_synthetic_csv(path, rows, seed=0, reference=DATASET_PATH, chunk_rows=WRITE_CHUNK_ROWS):
+    profile = dataset_profile(reference)
+    rng = np.random.default_rng(seed)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', newline='') as f:
+        for offset in range(0, rows, chunk_rows):
+            chunk = generate_frame(profile, min(chunk_rows, rows - offset), rng, offset)
+            chunk.to_csv(f, header=offset == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+# Path of a synthetic dataset with the given number of rows in a directory, generated on first use
+def synthetic_dataset(rows, directory, seed=0, reference=DATASET_PATH):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"synthetic_{rows}_{seed}.csv")
+    if not os.path.exists(path):
+        write_synthetic_csv(path, rows, seed, reference)
+    return path
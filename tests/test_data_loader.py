@@ -0,0 +1,19 @@
+import pandas as pd
+
+from data_loader import BOOLEAN_COLUMNS, memory_report
+from synthetic_data import write_synthetic_csv
+
+
+# Flags are one-byte booleans, and nullable booleans once some of them are missing
+def test_flags_are_booleans(tmp_path):
+    path = write_synthetic_csv(str(tmp_path / 'synthetic.csv'), 1_000, seed=1)
+    assert (memory_report(path).loc[BOOLEAN_COLUMNS, 'type after'] == 'bool').all()
+
+    df = pd.read_csv(path)
+    for column in BOOLEAN_COLUMNS:
+        df[column] = df[column].astype(object)
+        df.loc[::7, column] = None
+    df.to_csv(path, index=False)
+    report = memory_report(path).loc[BOOLEAN_COLUMNS]
+    assert (report['type before'] == 'object').all()
+    assert (report['type after'] == 'boolean').all()
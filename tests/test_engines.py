@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import DATASET_PATH
+from engines import check_parity
+from synthetic_data import write_synthetic_csv
+
+pytest.importorskip('duckdb')
+
+
+def test_engines_agree_on_bundled_dataset():
+    assert check_parity(DATASET_PATH) == []
+
+
+# Synthetic rows with missing values in every measure, so groups and pairs go partially missing
+def test_engines_agree_with_missing_values(tmp_path):
+    path = write_synthetic_csv(str(tmp_path / 'synthetic.csv'), 5_000, seed=1)
+    df = pd.read_csv(path)
+    rng = np.random.default_rng(1)
+    for column in ['Age', 'Purchase Amount ($)', 'Time Spent on Website (min)', 'Number of Items Purchased',
+                   'Review Score (1-5)', 'Delivery Time (days)']:
+        df.loc[rng.random(len(df)) < 0.05, column] = np.nan
+    df.to_csv(path, index=False)
+    assert check_parity(path) == []
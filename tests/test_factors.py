@@ -0,0 +1,16 @@
+import pytest
+
+from aggregates import load_cube
+from data_loader import DATASET_PATH
+from factors import categorical_factors
+
+pa = pytest.importorskip('pyarrow')
+
+
+# The dashboard shows both tables with st.dataframe, which needs them to convert to Arrow
+def test_categorical_factors_convert_to_arrow():
+    factors, rates = categorical_factors(load_cube(DATASET_PATH))
+    pa.Table.from_pandas(factors)
+    table = pa.Table.from_pandas(rates)
+    level = table.schema.field('Level').type
+    assert pa.types.is_string(level) or pa.types.is_large_string(level)
@@ -0,0 +1,30 @@
+import numpy as np
+
+from sketches import EXACT_THRESHOLD, QuantileSketch, kll_rank_error
+
+QUANTILES = np.linspace(0.01, 0.99, 99)
+
+
+# Largest distance, as a fraction of the values, between the ranks of the sketch's answers and the
+# ranks of the exact quantiles
+def max_rank_error(sketch, data):
+    data = np.sort(data)
+    answers = np.searchsorted(data, sketch.quantile(QUANTILES), side='right')
+    exact = np.searchsorted(data, np.quantile(data, QUANTILES), side='right')
+    return np.abs(answers - exact).max() / len(data)
+
+
+# Sketches built from chunks and merged from per-chunk sketches, both well past the exact threshold
+def test_sketch_rank_error_within_reported_bound():
+    data = np.random.default_rng(0).lognormal(size=6 * EXACT_THRESHOLD)
+    updated = QuantileSketch(seed=1)
+    for chunk in np.array_split(data, 37):
+        updated.update(chunk)
+    merged = QuantileSketch(seed=2)
+    for seed, chunk in enumerate(np.array_split(data, 11)):
+        merged.merge(QuantileSketch(seed=seed).update(chunk))
+
+    for sketch in (updated, merged):
+        assert not sketch.exact
+        assert sketch.rank_error == kll_rank_error(sketch.k)
+        assert max_rank_error(sketch, data) <= sketch.rank_error
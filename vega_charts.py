@@ -0,0 +1,433 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+# Vega-Lite versions of the figure builders in charts.py, under the same names and arguments. Each
+# returns a spec with the chart's aggregated rows inlined, which the browser draws, so a chart costs
+# the server a few dozen JSON records instead of a Matplotlib render. A builder returns None when
+# its chart has to stay a server-rendered image (e.g. one marker per row of a large dataset); the
+# caller then falls back to charts.py. Only pandas and numpy are needed here.
+
+# How the dashboards draw charts (STATICA_RENDERER): 'vega' sends these specs and draws the rest
+# with Matplotlib; 'matplotlib' renders every chart to an image on the server. The report builder
+# always renders images.
+RENDERERS = ['vega', 'matplotlib']
+RENDERER = os.environ.get('STATICA_RENDERER', 'vega')
+if RENDERER not in RENDERERS:
+    raise ValueError(f"Unknown chart renderer {RENDERER!r} (expected one of {', '.join(RENDERERS)})")
+
+# Charts that would inline more rows than this are left to the Matplotlib builder
+MAX_SPEC_ROWS = 1000
+
+# Matplotlib's "coolwarm" is blue at -1 and red at +1
+CORRELATION_SCALE = {'scheme': 'redblue', 'reverse': True, 'domain': [-1, 1]}
+
+# Slanted category labels, as the Matplotlib charts rotate their x ticks by 45°
+SLANTED = {'labelAngle': -45}
+
+
+# JSON-safe copy of a scalar: numpy types become Python ones, missing values null, labels text
+def _json_value(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, (bool, int, str)):
+        return value
+    return str(value)
+
+
+# Records {name: value} of equally long columns, e.g. _records(x=labels, y=counts)
+def _records(**columns):
+    names = list(columns)
+    rows = zip(*[[_json_value(value) for value in column] for column in columns.values()])
+    return [dict(zip(names, row)) for row in rows]
+
+
+# Records of a Series: its index as x and its values as y
+def _series_records(series):
+    return _records(x=series.index, y=series.to_numpy())
+
+
+def _spec(title, values, **view):
+    return {'title': title, 'data': {'values': values}, **view}
+
+
+def _axis(field, title, kind='nominal', **options):
+    channel = {'field': field, 'type': kind, 'title': title}
+    if kind == 'nominal':
+        channel['sort'] = None
+    channel.update(options)
+    return channel
+
+
+# One color per bar, from a named scheme or a list of colors, without a legend
+def _bar_colors(field, colors):
+    scale = {'scheme': colors} if isinstance(colors, str) else {'range': list(colors)}
+    return {'field': field, 'type': 'nominal', 'sort': None, 'scale': scale, 'legend': None}
+
+
+# Vertical bars of a Series (x: its index, y: its values)
+def _series_bars(series, title, x_title, y_title, colors=None, slanted=False, **view):
+    encoding = {'x': _axis('x', x_title, **({'axis': SLANTED} if slanted else {})),
+                'y': _axis('y', y_title, 'quantitative')}
+    if colors is not None:
+        encoding['color'] = _bar_colors('x', colors)
+    return _spec(title, _series_records(series), mark='bar', encoding=encoding, **view)
+
+
+# Pie of the records' theta field, labelled with each slice's share like autopct='%1.1f%%'
+def _pie_view(theta, color, colors=None, groupby=()):
+    scale = {'range': list(colors)} if colors is not None else {}
+    return {
+        'transform': [{'joinaggregate': [{'op': 'sum', 'field': theta, 'as': 'total'}], 'groupby': list(groupby)},
+                      {'calculate': f"format(datum.{theta} / datum.total, '.1%')", 'as': 'share'}],
+        'encoding': {'theta': {'field': theta, 'type': 'quantitative', 'stack': True},
+                     'color': {'field': color, 'type': 'nominal', 'sort': None, 'scale': scale, 'title': None},
+                     'order': {'field': 'order', 'type': 'quantitative'}},
+        'layer': [{'mark': {'type': 'arc', 'outerRadius': 100}},
+                  {'mark': {'type': 'text', 'radius': 70, 'fill': 'black'}, 'encoding': {'text': {'field': 'share'}}}],
+    }
+
+
+def _pie(title, labels, sizes, colors=None):
+    values = _records(label=labels, size=sizes, order=range(len(sizes)))
+    return _spec(title, values, **_pie_view('size', 'label', colors))
+
+
+# Level 1 Q1: mean, median and mode of Age
+def plot_age_statistics(statistics, values):
+    encoding = {'x': _axis('statistic', None), 'y': _axis('age', 'Age', 'quantitative'),
+                'color': _bar_colors('statistic', ['#1f77b4', '#ff7f0e', '#2ca02c'])}
+    return _spec('Mean, Median, and Mode of Age', _records(statistic=statistics, age=values), encoding=encoding,
+                 layer=[{'mark': 'bar'},
+                        {'mark': {'type': 'text', 'dy': -6},
+                         'encoding': {'text': {'field': 'age', 'format': '.2f'}, 'color': {'value': 'black'}}}])
+
+
+# Level 1 Q2: one marker per row is only sent for small datasets
+def plot_purchase_z_scores(z_scores, density_threshold):
+    if len(z_scores) >= density_threshold or len(z_scores) > MAX_SPEC_ROWS:
+        return None
+    values = _records(index=z_scores.index, z=z_scores.to_numpy())
+    rules = _records(z=[0, 3, -3], color=['black', 'red', 'red'])
+    return _spec('Z-scores of Purchase Amounts', values, layer=[
+        {'mark': {'type': 'point', 'filled': True, 'size': 80},
+         'encoding': {'x': _axis('index', 'Index', 'quantitative'), 'y': _axis('z', 'Z-score', 'quantitative'),
+                      'color': {'field': 'z', 'type': 'quantitative', 'scale': {'scheme': 'redblue', 'reverse': True},
+                                'title': 'Z-score'}}},
+        {'data': {'values': rules}, 'mark': {'type': 'rule', 'strokeDash': [6, 4]},
+         'encoding': {'y': {'field': 'z', 'type': 'quantitative'},
+                      'color': {'field': 'color', 'type': 'nominal', 'scale': None}}}])
+
+
+# Level 1 Q2 from streamed aggregates: distribution of the purchase amount z-scores
+def plot_purchase_z_score_histogram(z_centers, counts):
+    values = _records(z=z_centers, count=counts, outlier=np.abs(z_centers) > 3)
+    rules = _records(z=[0, 3, -3], color=['black', 'red', 'red'])
+    return _spec('Distribution of Z-scores of Purchase Amounts', values, layer=[
+        {'mark': 'bar',
+         'encoding': {'x': _axis('z', 'Z-score', 'quantitative'), 'y': _axis('count', 'Number of Purchases',
+                                                                             'quantitative'),
+                      'color': {'field': 'outlier', 'type': 'nominal', 'title': '|Z| > 3',
+                                'scale': {'domain': [False, True], 'range': ['#4c72b0', 'red']}}}},
+        {'data': {'values': rules}, 'mark': {'type': 'rule', 'strokeDash': [6, 4]},
+         'encoding': {'x': {'field': 'z', 'type': 'quantitative'},
+                      'color': {'field': 'color', 'type': 'nominal', 'scale': None}}}])
+
+
+# Level 1 Q3: top product categories by number of purchases
+def plot_top_categories(top_categories):
+    spec = _series_bars(top_categories, 'Top 3 Product Categories by Number of Purchases', 'Product Categories',
+                        'Number of Purchases', colors=['skyblue', 'lightgreen', 'salmon'])
+    spec['layer'] = [{'mark': 'bar'}, {'mark': {'type': 'text', 'dy': -6},
+                                       'encoding': {'text': {'field': 'y'}, 'color': {'value': 'black'}}}]
+    del spec['mark']
+    return spec
+
+
+# Level 1 Q4: return rate per product category
+def plot_return_rate_by_category(comparison_summary):
+    values = _records(category=comparison_summary['Product Category'], rate=comparison_summary['Return Rate (%)'])
+    encoding = {'y': _axis('category', 'Product Category'), 'x': _axis('rate', 'Return Rate (%)', 'quantitative')}
+    return _spec('Return Rate by Product Category', values, encoding=encoding, layer=[
+        {'mark': {'type': 'bar', 'color': '#4c72b0'}},
+        {'mark': {'type': 'text', 'align': 'left', 'dx': 4},
+         'transform': [{'calculate': "format(datum.rate, '.2f') + '%'", 'as': 'label'}],
+         'encoding': {'text': {'field': 'label'}}}])
+
+
+# Level 1 Q4: return customers per age range and gender
+def plot_return_customers_by_age_gender(age_gender_return_summary):
+    summary = age_gender_return_summary
+    values = _records(age=summary['Age Range'], gender=summary['Gender'], count=summary['Count'])
+    encoding = {'x': _axis('age', 'Age Range'), 'xOffset': {'field': 'gender', 'sort': None},
+                'y': _axis('count', 'Count of Return Customers', 'quantitative'),
+                'color': {'field': 'gender', 'type': 'nominal', 'sort': None, 'scale': {'scheme': 'set2'},
+                          'title': 'Gender'}}
+    return _spec('Return Customers by Age Range and Gender', values, mark='bar', encoding=encoding)
+
+
+# Level 1 Q5: share of reviews per product category
+def plot_review_distribution(comparison_summary):
+    spec = _pie('Distribution of Total Reviews by Product Category', comparison_summary['Product Category'],
+                comparison_summary['Total Reviews'])
+    spec['encoding']['color']['scale'] = {'scheme': 'tableau20'}
+    return spec
+
+
+# Level 1 Q5: total reviews next to the average review score per product category
+def plot_reviews_and_scores_by_category(comparison_summary):
+    categories = comparison_summary['Product Category']
+    measures = ['Total Reviews', 'Average Review Score']
+    values = _records(category=np.tile(categories.to_numpy(), len(measures)),
+                      measure=np.repeat(measures, len(categories)),
+                      value=np.concatenate([comparison_summary[measure].to_numpy() for measure in measures]))
+    encoding = {'y': _axis('category', 'Product Categories'), 'yOffset': {'field': 'measure', 'sort': None},
+                'x': _axis('value', 'Count / Score', 'quantitative')}
+    return _spec('Total Reviews and Average Review Scores by Product Category', values, encoding=encoding, layer=[
+        {'mark': 'bar', 'encoding': {'color': {'field': 'measure', 'type': 'nominal', 'sort': None, 'title': None,
+                                               'scale': {'range': ['#2171b5', '#238b45']}}}},
+        {'mark': {'type': 'text', 'align': 'left', 'dx': 2},
+         'transform': [{'calculate': "datum.measure == 'Total Reviews' ? format(datum.value, 'd') : "
+                                     "format(datum.value, '.1f')", 'as': 'label'}],
+         'encoding': {'text': {'field': 'label'}}}])
+
+
+# Level 1 Q6: average delivery time per subscription status
+def plot_delivery_time_by_subscription(avg_delivery_time_df):
+    values = _records(status=avg_delivery_time_df['Subscription Status'],
+                      days=avg_delivery_time_df['Delivery Time (days)'])
+    encoding = {'x': _axis('status', 'Subscription Status'),
+                'y': _axis('days', 'Average Delivery Time (days)', 'quantitative'),
+                'color': _bar_colors('status', 'tableau10')}
+    return _spec('Average Delivery Time by Subscription Status', values, mark='bar', encoding=encoding)
+
+
+# Level 1 Q7: subscribed vs unsubscribed customers
+def plot_subscription_distribution(subscribed_customers, unsubscribed_customers):
+    return _pie('Subscription Status Distribution', ['Subscribed Customers', 'Unsubscribed Customers'],
+                [subscribed_customers, unsubscribed_customers], colors=['lightcoral', 'lightgreen'])
+
+
+# Level 1 Q8: share of customers per device type
+def plot_device_usage(device_usage_percentage):
+    spec = _pie('Device Usage Percentage', device_usage_percentage.index, device_usage_percentage.to_numpy())
+    spec['encoding']['color']['scale'] = {'scheme': 'set2'}
+    return spec
+
+
+# Level 1 Q9: average purchase amount with and without discount
+def plot_purchase_by_discount(avg_purchase_discount):
+    return _series_bars(avg_purchase_discount, 'Average Purchase Amount by Discount Status',
+                        'Discount Availed (0 = No, 1 = Yes)', 'Average Purchase Amount ($)', colors='set2')
+
+
+# Level 1 Q10: number of users per payment method
+def plot_payment_method_distribution(payment_method_counts):
+    return _series_bars(payment_method_counts, 'Payment Method Distribution', 'Payment Method', 'Number of Users',
+                        colors='set3')
+
+
+# Average review scores (bars, left axis) and count of reviews (line, right axis) by payment method
+def plot_reviews_by_payment_method(avg_reviews_by_payment, count_reviews_by_payment):
+    values = _records(method=avg_reviews_by_payment.index, score=avg_reviews_by_payment.to_numpy(),
+                      count=count_reviews_by_payment.reindex(avg_reviews_by_payment.index).to_numpy())
+    x = _axis('method', 'Payment Method', axis=SLANTED)
+    return _spec('Average Review Scores and Count of Reviews by Payment Method', values, layer=[
+        {'mark': {'type': 'bar', 'color': '#1f77b4'},
+         'encoding': {'x': x, 'y': _axis('score', 'Average Review Score (1-5)', 'quantitative',
+                                         scale={'domain': [0, 5]}, axis={'titleColor': '#1f77b4'})}},
+        {'mark': {'type': 'line', 'color': '#ff7f0e', 'point': True},
+         'encoding': {'x': x, 'y': _axis('count', 'Count of Reviews', 'quantitative',
+                                         axis={'titleColor': '#ff7f0e'})}}],
+        resolve={'scale': {'y': 'independent'}})
+
+
+# Level 2 Q1: average review score of the most common payment method
+def plot_most_common_payment_review(most_common_payment_method, average_review_score):
+    values = _records(method=[most_common_payment_method], score=[average_review_score])
+    encoding = {'x': _axis('method', 'Payment Method'), 'y': _axis('score', 'Average Review Score', 'quantitative')}
+    return _spec(f'Average Review Score for {most_common_payment_method}', values, encoding=encoding, layer=[
+        {'mark': {'type': 'bar', 'color': '#3d7ab3'}},
+        {'mark': {'type': 'text', 'dy': -8}, 'encoding': {'text': {'field': 'score', 'format': '.2f'}}}])
+
+
+# Level 2 Q1: Bank Transfer users per age group
+def plot_bank_transfer_age_groups(age_group_counts):
+    return _series_bars(age_group_counts, 'Number of Bank Transfer Users by Age Group', 'Age Group',
+                        'Number of Users', colors=['skyblue'], slanted=True)
+
+
+# Level 2 Q1: payment methods used by customers aged 10-19
+def plot_teen_payment_methods(payment_method_counts):
+    return _series_bars(payment_method_counts, 'Payment Methods Used by Customers Aged 10-19', 'Payment Method',
+                        'Number of Users', colors=['lightblue'], slanted=True)
+
+
+# Level 2 Q1: number of users per location
+def plot_users_by_location(location_counts):
+    return _series_bars(location_counts, 'Number of Users by Location', 'Location', 'Number of Users',
+                        colors=['lightcoral'], slanted=True)
+
+
+# Number of Bank Transfer users per location, most first (streamlit.py)
+def plot_bank_transfer_users_by_location(location_counts):
+    return _series_bars(location_counts, 'Number of Bank Transfer Users by Location', 'Location', 'Number of Users',
+                        colors=['lightgreen'], slanted=True)
+
+
+# Level 2 Q1: one payment method pie per location of interest
+def plot_payment_methods_by_location(payment_methods_by_location, locations_of_interest):
+    values = []
+    for location in locations_of_interest:
+        counts = payment_methods_by_location.loc[location]
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+        values += _records(location=[location] * len(counts), method=counts.index, count=counts.to_numpy(),
+                           order=range(len(counts)))
+    view = _pie_view('count', 'method', ['#ff9999', '#66b3ff', '#99ff99', '#ffcc99'], groupby=['location'])
+    transform = view.pop('transform')
+    return _spec('Payment Methods by Location', values, transform=transform, spec=view,
+                 facet={'field': 'location', 'type': 'nominal', 'sort': list(locations_of_interest),
+                        'header': {'title': None, 'labelExpr': "'Payment Methods Used in ' + datum.value"}})
+
+
+# Level 2 Q2: purchase behaviour per bin of time spent on the website
+def plot_time_on_site(df_grouped):
+    values = _records(time=df_grouped['Time Bins'], purchase=df_grouped['Purchase Amount ($)'],
+                      items=df_grouped['Number of Items Purchased'])
+    x = _axis('time', 'Time Spent on Website (min)', axis=SLANTED)
+    return _spec('', values, vconcat=[
+        {'title': 'Average Purchase Amount by Time Spent on Website',
+         'mark': {'type': 'line', 'point': True, 'color': 'blue'},
+         'encoding': {'x': x, 'y': _axis('purchase', 'Average Purchase Amount ($)', 'quantitative',
+                                         scale={'zero': False})}},
+        {'title': 'Average Number of Items Purchased by Time Spent on Website',
+         'mark': {'type': 'line', 'point': True, 'color': 'green'},
+         'encoding': {'x': x, 'y': _axis('items', 'Average Number of Items Purchased', 'quantitative',
+                                         scale={'zero': False})}}])
+
+
+# Level 2 Q4: average items purchased per satisfaction level
+def plot_items_by_satisfaction(average_items_per_satisfaction):
+    return _series_bars(average_items_per_satisfaction,
+                        'Relationship between Customer Satisfaction and Number of Items Purchased',
+                        'Customer Satisfaction', 'Average Number of Items Purchased', colors='tableau10')
+
+
+# Level 2 Q5: average purchase amount per location, marking the 2nd highest
+def plot_purchase_by_location(sorted_average_purchase, second_highest_avg_purchase):
+    spec = _series_bars(sorted_average_purchase, 'Average Purchase Amount by Location', 'Location',
+                        'Average Purchase Amount ($)', colors='viridis', slanted=True)
+    if not np.isnan(second_highest_avg_purchase):
+        rule = {'data': {'values': _records(y=[second_highest_avg_purchase], label=['2nd Highest Average Purchase'])},
+                'mark': {'type': 'rule', 'strokeDash': [6, 4], 'size': 2},
+                'encoding': {'y': {'field': 'y', 'type': 'quantitative'},
+                             'stroke': {'field': 'label', 'type': 'nominal', 'title': None,
+                                        'scale': {'range': ['red']}}}}
+        bars = {'mark': spec.pop('mark'), 'encoding': spec.pop('encoding')}
+        spec['layer'] = [bars, rule]
+    return spec
+
+
+# Cells of a correlation matrix as records, rows and columns in the matrix's order (r to 4 decimals, 2 are shown)
+def _correlation_cells(matrix, **keys):
+    names = list(matrix.columns)
+    r = matrix.to_numpy(dtype=np.float64)
+    cells = _records(x=np.tile(names, len(names)), y=np.repeat(names, len(names)), r=np.round(r.ravel(), 4))
+    for cell in cells:
+        cell.update(keys)
+    return cells
+
+
+# Heatmap layers of a correlation matrix, annotated like fmt='.2f'
+def _correlation_view(names):
+    return {
+        'encoding': {'x': _axis('x', None, sort=names), 'y': _axis('y', None, sort=names)},
+        'layer': [{'mark': 'rect', 'encoding': {'color': {'field': 'r', 'type': 'quantitative', 'title': 'Pearson r',
+                                                          'scale': CORRELATION_SCALE}}},
+                  {'mark': {'type': 'text', 'fontSize': 10},
+                   'encoding': {'text': {'field': 'r', 'type': 'quantitative', 'format': '.2f'}}}],
+    }
+
+
+# Level 2 Q6: correlation matrix of the numeric columns
+def plot_correlation_matrix(correlations, title):
+    return _spec(f'Correlations Between Numeric Columns: {title}', _correlation_cells(correlations),
+                 width=360, height=360, **_correlation_view(list(correlations.columns)))
+
+
+# Level 2 Q6: one correlation matrix per label of a dimension, sharing one color scale
+def plot_correlation_matrices(correlations, dim):
+    labels = correlations.index.get_level_values(0).unique()
+    if len(labels) == 0:
+        return None
+    values = []
+    for label in labels:
+        values += _correlation_cells(correlations.loc[label], label=_json_value(label))
+    view = {'width': 200, 'height': 200, **_correlation_view(list(correlations.columns))}
+    return _spec(f'Correlations Between Numeric Columns by {dim}', values, spec=view, columns=4,
+                 facet={'field': 'label', 'type': 'nominal', 'sort': None, 'title': None})
+
+
+# Level 3 Q2: satisfaction (bars, left axis) and return rate (line, right axis) per payment method
+def plot_satisfaction_and_return_rate(combined_data):
+    values = _records(method=combined_data['Payment Method'], score=combined_data['Review Score (1-5)'],
+                      rate=combined_data['Return Rate (%)'])
+    x = _axis('method', 'Payment Method', axis=SLANTED)
+    return _spec('Customer Satisfaction and Return Rate by Payment Method', values, layer=[
+        {'mark': 'bar', 'encoding': {'x': x, 'y': _axis('score', 'Average Review Score (1-5)', 'quantitative'),
+                                     'color': _bar_colors('method', 'viridis')}},
+        {'mark': {'type': 'line', 'color': 'red', 'point': {'color': 'red'}},
+         'encoding': {'x': x, 'y': _axis('rate', 'Return Rate (%)', 'quantitative')}}],
+        resolve={'scale': {'y': 'independent', 'color': 'independent'}})
+
+
+# Level 3 Q3: average purchase amount and delivery time per location
+def plot_location_purchase_and_delivery(location_data):
+    values = _records(location=location_data['Location'], purchase=location_data['Purchase Amount ($)'],
+                      days=location_data['Delivery Time (days)'])
+    x = _axis('location', 'Location', axis=SLANTED)
+    return _spec('', values, hconcat=[
+        {'title': 'Average Purchase Amount by Location', 'mark': 'bar',
+         'encoding': {'x': x, 'y': _axis('purchase', 'Average Purchase Amount ($)', 'quantitative'),
+                      'color': _bar_colors('location', 'blues')}},
+        {'title': 'Average Delivery Time by Location', 'mark': 'bar',
+         'encoding': {'x': x, 'y': _axis('days', 'Average Delivery Time (days)', 'quantitative'),
+                      'color': _bar_colors('location', 'greens')}}],
+        resolve={'scale': {'color': 'independent'}})
+
+
+# Level 3 Q4: gender distribution of customers
+def plot_gender_distribution(labels, sizes):
+    return _pie('Gender Distribution of Customers', labels, sizes, colors=['#ff9999', '#66b3ff', '#99ff99'])
+
+
+# Level 3 Q1: association of every feature with being a return customer, strongest first
+def plot_return_factors(factors, significance):
+    values = _records(feature=factors['Feature'], v=factors["Cramér's V"],
+                      significant=factors['p-value'] < significance)
+    encoding = {'y': _axis('feature', None), 'x': _axis('v', "Cramér's V", 'quantitative'),
+                'color': {'field': 'significant', 'type': 'nominal', 'title': f'p < {significance:g}',
+                          'scale': {'domain': [True, False], 'range': ['#d62728', '#7f7f7f']}}}
+    return _spec(f'Association with Being a Return Customer (red: p < {significance:g})', values, mark='bar',
+                 encoding=encoding)
+
+
+# Level 3 Q1: standardized difference of each numeric feature between return and other customers
+def plot_numeric_effects(effects, confidence):
+    values = _records(feature=effects['Feature'], d=effects["Cohen's d"], low=effects['d CI low'],
+                      high=effects['d CI high'])
+    y = _axis('feature', None)
+    x_title = f"Cohen's d (return minus other customers, {confidence:.0%} CI)"
+    return _spec('Numeric Features of Return Customers', values, layer=[
+        {'mark': {'type': 'rule', 'color': '#1f77b4'},
+         'encoding': {'y': y, 'x': _axis('low', x_title, 'quantitative'), 'x2': {'field': 'high'}}},
+        {'mark': {'type': 'point', 'filled': True, 'color': '#1f77b4', 'size': 60},
+         'encoding': {'y': y, 'x': {'field': 'd', 'type': 'quantitative'}}},
+        {'data': {'values': [{'d': 0}]}, 'mark': {'type': 'rule', 'color': 'gray', 'strokeDash': [6, 4]},
+         'encoding': {'x': {'field': 'd', 'type': 'quantitative'}}}])
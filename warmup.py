@@ -0,0 +1,94 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from aggregate_server import attach_aggregates
+from column_store import restore_store
+from data_loader import DATASET_PATH
+from figure_cache import FIGURE_THEME, figure_cache, figure_key
+from questions import COMPUTE, compute_question, install_results, load_dashboard_data
+from snapshot import SNAPSHOT_DIR, read_results, restore_snapshot, write_results
+from vega_charts import RENDERER
+
+# Warm-up (STATICA_WARMUP=0 turns it off): the first time a server process sees a version of the
+# dataset, the results of every question on all rows are loaded from the results a previous
+# process saved for it, or else computed and saved, and the figures the dashboard renders on the
+# server are drawn into the figure cache. It runs in the background, so the first visitor of each
+# question after a deploy or a data refresh is served from the caches like every later one.
+WARMUP = os.environ.get('STATICA_WARMUP', '1') != '0'
+
+# Threads computing the questions of a warm-up
+WARMUP_WORKERS = int(os.environ.get('STATICA_WARMUP_WORKERS', '0')) or os.cpu_count() or 1
+
+_warmups = {}
+_warmups_lock = threading.Lock()
+_warmup_pool = None
+
+
+# Results of every question on all rows of the data's version, computed in a thread pool unless
+# they were saved before; then the figures that are not drawn in the browser (see vega_charts.py)
+# are rendered into the figure cache under the keys the dashboard looks them up by. Returns where
+# the results came from, how many figures were rendered and the seconds spent.
+def warm_up(data, path=DATASET_PATH, directory=SNAPSHOT_DIR, render=True):
+    start = time.perf_counter()
+    results = read_results(data.version, path, directory)
+    source = 'loaded'
+    if results is None:
+        source = 'computed'
+        with ThreadPoolExecutor(WARMUP_WORKERS, thread_name_prefix='warmup') as pool:
+            results = dict(zip(COMPUTE, pool.map(lambda question: compute_question(question, data), COMPUTE)))
+        try:
+            write_results(data.version, results, path, directory)
+        except OSError:
+            # Saving is best effort; this process still has the results
+            pass
+    else:
+        install_results(data.version, results)
+
+    futures = []
+    if render:
+        for question, result in results.items():
+            for figure, (draw, *args) in result.figures.items():
+                if RENDERER == 'vega' and draw.spec(*args) is not None:
+                    continue
+                key = figure_key(question, figure, None, data.version, FIGURE_THEME)
+                futures.append(figure_cache.submit(key, draw, *args))
+        wait(futures)
+    return {'results': source, 'figures': len(futures), 'seconds': time.perf_counter() - start}
+
+
+# Warm the caches for the data's version in a background thread, once per version and process.
+# Cheap to call on every rerun: later calls for the same version return the same future. Filtered
+# views and streamed aggregates are not cached, so there is nothing to warm for them.
+def start_warmup(data, path=DATASET_PATH):
+    global _warmup_pool
+    if not WARMUP or data.streaming or data.filters:
+        return None
+    with _warmups_lock:
+        future = _warmups.get(data.version)
+        if future is None:
+            if _warmup_pool is None:
+                _warmup_pool = ThreadPoolExecutor(1, thread_name_prefix='warmup-start')
+            future = _warmups[data.version] = _warmup_pool.submit(warm_up, data, path)
+        return future
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute and save the results of every question and render the '
+                                                 'server-side figures into the figure cache, e.g. at deploy time.')
+    parser.add_argument('--dataset', default=DATASET_PATH, help='CSV file to analyse')
+    parser.add_argument('--output', default=SNAPSHOT_DIR, help='directory of the saved results '
+                                                               '(default: %(default)s)')
+    parser.add_argument('--no-figures', action='store_true', help='only compute the results')
+    args = parser.parse_args()
+
+    attach_aggregates(args.dataset) or restore_snapshot(args.dataset) or restore_store(args.dataset)
+    data = load_dashboard_data(args.dataset, streaming=False)
+    summary = warm_up(data, args.dataset, args.output, render=not args.no_figures)
+    print(f"Results {summary['results']} and {summary['figures']} figures rendered in {summary['seconds']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()